@@ -0,0 +1,28 @@
+-- Per-candidate partial HNSW indexes for filtered search.
+-- Run after loading data (re-run when a candidate crosses the threshold).
+-- Candidates below the threshold are served by an exact scan through
+-- transcript_chunks_candidate_idx (see Settings.filtered_exact_max_rows),
+-- so they do not need their own graph.
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT candidate, COUNT(*) AS n
+        FROM transcript_chunks
+        WHERE candidate IS NOT NULL
+        GROUP BY 1
+        HAVING COUNT(*) > 2000
+    LOOP
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON transcript_chunks '
+            'USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 128) '
+            'WHERE candidate = %L',
+            'transcript_chunks_emb_' || left(md5(r.candidate), 12),
+            r.candidate
+        );
+        RAISE NOTICE 'partial HNSW for % (% rows)', r.candidate, r.n;
+    END LOOP;
+END $$;
+
+ANALYZE transcript_chunks;
@@ -0,0 +1,14 @@
+-- Full-text column for hybrid (tsvector + vector) retrieval.
+-- Migration for databases created before the column existed; safe to re-run.
+-- db_loader applies the same statements and backfills `tsv` on every load,
+-- so running this by hand is only needed before the next load.
+
+ALTER TABLE transcript_chunks ADD COLUMN IF NOT EXISTS "tsv" TSVECTOR;
+
+UPDATE transcript_chunks
+SET tsv = to_tsvector('spanish', coalesce(text, ''))
+WHERE tsv IS NULL;
+
+CREATE INDEX IF NOT EXISTS transcript_chunks_tsv_idx ON transcript_chunks USING gin (tsv);
+
+ANALYZE transcript_chunks;
@@ -0,0 +1,18 @@
+-- Optional quantized first-stage indexes (pgvector >= 0.7).
+-- Run after pgvector_schema.sql. The table keeps the full float32 `embedding`
+-- column, which the API uses to re-rank the quantized candidates exactly.
+-- Pick one (or both) and set AIPE_QUANTIZE / Settings.search_mode to match.
+
+-- halfvec: float16 copy in the index, ~2 KB per chunk
+CREATE INDEX IF NOT EXISTS transcript_chunks_embedding_half_idx ON transcript_chunks
+    USING hnsw ((embedding::halfvec(1024)) halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 128);
+
+-- binary: 1 bit per dimension, 128 B per chunk, Hamming distance
+CREATE INDEX IF NOT EXISTS transcript_chunks_embedding_bin_idx ON transcript_chunks
+    USING hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops)
+    WITH (m = 16, ef_construction = 128);
+
+-- Once a quantized index serves the first stage, the full-precision HNSW
+-- index is no longer needed in memory:
+-- DROP INDEX IF EXISTS transcript_chunks_embedding_idx;
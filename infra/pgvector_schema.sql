@@ -12,11 +12,19 @@ CREATE TABLE transcript_chunks (
     --"speaker"   TEXT,
     "start"     REAL,
     "end"       REAL,
-    "video_id"  TEXT
+    "video_id"  TEXT,
     --"url"       TEXT
+    "tsv"       TSVECTOR    -- to_tsvector('spanish', text), filled by db_loader
 );
 
 -- Cosine-distance using HNSW index
-CREATE INDEX ON transcript_chunks
+-- (quantized first-stage alternatives: see pgvector_quantized.sql)
+CREATE INDEX transcript_chunks_embedding_idx ON transcript_chunks
     USING hnsw (embedding vector_cosine_ops)
-    WITH (m = 16, ef_construction = 128);
\ No newline at end of file
+    WITH (m = 16, ef_construction = 128);
+
+-- Candidate filter (exact scans for small candidates, per-candidate stats)
+CREATE INDEX transcript_chunks_candidate_idx ON transcript_chunks (candidate);
+
+-- Spanish full-text search (hybrid retrieval; existing databases: pgvector_hybrid.sql)
+CREATE INDEX IF NOT EXISTS transcript_chunks_tsv_idx ON transcript_chunks USING gin (tsv);
@@ -0,0 +1,62 @@
+"""
+Fixed-size vs token-budget batching on a real chunks parquet.
+
+Always reports batches and padding ratio (padded / real tokens) for both
+strategies; with --encode also times the model on a sample.
+
+    python scripts/bench_batching.py --batch 128 --max-tokens 16384
+    python scripts/bench_batching.py --encode --sample 2000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from aipe_ingest.batching import fixed_batches, padding_ratio, token_budget_batches
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--input", "-i", default="datasets/processed/chunks.parquet")
+    p.add_argument("--batch", "-b", type=int, default=128)
+    p.add_argument("--max-tokens", type=int, default=16_384)
+    p.add_argument("--encode", action="store_true", help="Also time model.encode")
+    p.add_argument("--sample", type=int, default=2000, help="Rows to encode with --encode")
+    p.add_argument("--model", "-m", default="intfloat/multilingual-e5-large")
+    args = p.parse_args()
+
+    df = pd.read_parquet(args.input, columns=["text", "n_tokens"])
+    lengths = df["n_tokens"].to_numpy()
+
+    strategies = {
+        f"fixed({args.batch})": fixed_batches(len(df), args.batch),
+        f"budget({args.max_tokens})": token_budget_batches(lengths, args.max_tokens, args.batch),
+    }
+    print(f"{len(df):,} chunks, mean {lengths.mean():.0f} / max {lengths.max()} tokens")
+    print(f"{'strategy':<16} {'batches':>8} {'padding':>8}")
+    for name, batches in strategies.items():
+        print(f"{name:<16} {len(batches):>8,} {padding_ratio(lengths, batches):>8.2f}")
+
+    if not args.encode:
+        return
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model, device="cpu")
+    sample = df.sample(min(args.sample, len(df)), random_state=0).reset_index(drop=True)
+    texts, lens = sample["text"].tolist(), sample["n_tokens"].to_numpy()
+    model.encode(texts[:8])   # warm-up
+
+    for name, batches in {
+        "fixed": fixed_batches(len(texts), args.batch),
+        "budget": token_budget_batches(lens, args.max_tokens, args.batch),
+    }.items():
+        t0 = time.perf_counter()
+        for idx in batches:
+            model.encode([texts[i] for i in idx], batch_size=len(idx), show_progress_bar=False)
+        dt = time.perf_counter() - t0
+        print(f"{name:<8} {len(texts) / dt:>8.1f} texts/s  ({dt:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
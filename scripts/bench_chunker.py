@@ -0,0 +1,66 @@
+"""
+Micro-benchmark: previous per-sentence chunker vs the batched/deque one.
+
+Runs both over real cleaned transcripts and reports wall time, chunk
+counts and how far the summed sentence counts drift from re-tokenizing
+the joined chunk text.
+
+    python scripts/bench_chunker.py --input datasets/processed/cleaned --repeat 3
+"""
+import argparse
+import json
+import pathlib
+import time
+
+from aipe_ingest import chunker
+
+
+def legacy_chunk_segment(seg, chunk_size=chunker.CHUNK_SIZE, overlap=chunker.CHUNK_OVERLAP):
+    """The old algorithm: tokenize per sentence, pop(0) to trim, re-tokenize the chunk."""
+    buf, token_count, out = [], 0, []
+    for sent in chunker._sentences(seg["text"]):
+        sent_tokens = chunker._token_len(sent)
+        if token_count + sent_tokens > chunk_size and buf:
+            text = " ".join(buf)
+            out.append((text, chunker._token_len(text)))
+            while buf and token_count > overlap:
+                token_count -= chunker._token_len(buf.pop(0))
+        buf.append(sent)
+        token_count += sent_tokens
+    if buf:
+        text = " ".join(buf)
+        out.append((text, chunker._token_len(text)))
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--input", "-i", type=pathlib.Path, default=pathlib.Path("datasets/processed/cleaned"))
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    files = sorted(args.input.rglob("*_cleaned.json"))
+    if not files:
+        raise SystemExit(f"No *_cleaned.json under {args.input}")
+    segments = [seg for f in files for seg in json.loads(f.read_text(encoding="utf-8"))["segments"]]
+    print(f"{len(files)} files, {len(segments):,} segments")
+
+    def bench(fn):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            res = fn()
+            best = min(best, time.perf_counter() - t0)
+        return best, res
+
+    t_old, old = bench(lambda: [c for s in segments for c in legacy_chunk_segment(s)])
+    t_new, new = bench(lambda: [c for s in segments for c in chunker.chunk_segment(s, {})])
+
+    drift = [abs(c["n_tokens"] - n) for c, (_, n) in zip(new, old)]
+    print(f"legacy : {t_old:8.3f}s  {len(old):,} chunks")
+    print(f"batched: {t_new:8.3f}s  {len(new):,} chunks  ({t_old / max(t_new, 1e-9):.1f}x)")
+    print(f"n_tokens drift vs re-tokenized text: mean {sum(drift) / max(1, len(drift)):.2f}, max {max(drift, default=0)}")
+
+
+if __name__ == "__main__":
+    main()
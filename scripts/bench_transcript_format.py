@@ -0,0 +1,66 @@
+"""
+Benchmark: indent=2 JSON transcripts vs the columnar segments/words parquet.
+
+For every JSON transcript under --input, reports the on-disk size of both
+formats and the time to (a) load the full document and (b) load only what
+the chunker needs (segment text / role / start / end).
+
+    python scripts/bench_transcript_format.py --input datasets/processed/cleaned --repeat 3
+"""
+import argparse
+import json
+import pathlib
+import tempfile
+import time
+
+from aipe_ingest import transcript_store as ts
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--input", "-i", type=pathlib.Path, default=pathlib.Path("datasets/processed/cleaned"))
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    files = sorted(args.input.rglob("*.json"))
+    if not files:
+        raise SystemExit(f"No *.json under {args.input}")
+
+    tot = {"json_mb": 0.0, "pq_mb": 0.0, "json_full": 0.0, "pq_full": 0.0, "json_segs": 0.0, "pq_segs": 0.0}
+    with tempfile.TemporaryDirectory() as tmp:
+        for f in files:
+            dst = pathlib.Path(tmp) / f.name
+            ts.write_transcript(json.loads(f.read_text(encoding="utf-8")), dst)
+
+            tot["json_mb"] += f.stat().st_size / 2**20
+            tot["pq_mb"] += (ts.segments_path(dst).stat().st_size + ts.words_path(dst).stat().st_size) / 2**20
+
+            tot["json_full"] += best_of(lambda: json.loads(f.read_text(encoding="utf-8")), args.repeat)
+            tot["pq_full"] += best_of(lambda: ts.load_transcript(dst), args.repeat)
+            # JSON has no partial read: the chunker pays the full parse
+            tot["json_segs"] += best_of(
+                lambda: [(s["text"], s.get("role"), s["start"], s["end"])
+                         for s in json.loads(f.read_text(encoding="utf-8"))["segments"]], args.repeat)
+            tot["pq_segs"] += best_of(
+                lambda: ts.read_segments(dst, ["text", "role", "start", "end"]).to_pylist(), args.repeat)
+
+    print(f"{len(files)} transcripts")
+    print(f"{'':18}{'json':>10}{'parquet':>10}{'ratio':>8}")
+    print(f"{'size (MB)':18}{tot['json_mb']:>10.2f}{tot['pq_mb']:>10.2f}{tot['json_mb'] / max(tot['pq_mb'], 1e-9):>7.1f}x")
+    print(f"{'full load (s)':18}{tot['json_full']:>10.3f}{tot['pq_full']:>10.3f}"
+          f"{tot['json_full'] / max(tot['pq_full'], 1e-9):>7.1f}x")
+    print(f"{'segments only (s)':18}{tot['json_segs']:>10.3f}{tot['pq_segs']:>10.3f}"
+          f"{tot['json_segs'] / max(tot['pq_segs'], 1e-9):>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from aipe_common.logger import get_logger
+from aipe_common.logger import configure_logging, get_logger
 from aipe_common.exception import (
     error_message_detail,
     DataValidationError,
@@ -17,6 +17,7 @@ def risky_division():
         raise DataValidationError("Division by zero encountered") from exc
 
 if __name__ == "__main__":
+    configure_logging()
     try:
         risky_division()
     except DataValidationError:
@@ -0,0 +1,139 @@
+"""
+Bounded LRU + TTL cache for query embeddings.
+
+Keys are (model name, normalised question) so the same question with
+different casing / spacing hits the same entry. An optional `.npz`
+backing file lets warm entries survive restarts.
+
+Usage
+-----
+    cache = EmbeddingCache(max_size=10_000, ttl_s=86_400, path=Path("logs/qcache.npz"))
+    cache.load()
+    vec = cache.get(model_name, question)       # None on miss
+    cache.put(model_name, question, vec)
+    cache.save()
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from aipe_common.logger import get_logger
+
+log = get_logger(__name__)
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """NFC, lower-case, collapse whitespace."""
+    return _WS.sub(" ", unicodedata.normalize("NFC", text)).strip().lower()
+
+
+class EmbeddingCache:
+    def __init__(self, max_size: int = 10_000, ttl_s: float = 0, path: Optional[Path] = None):
+        self.max_size = max_size
+        self.ttl_s = ttl_s            # 0 = never expire
+        self.path = Path(path) if path else None
+
+        self._data: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(model_name: str, text: str) -> str:
+        return f"{model_name}\x1f{normalize_question(text)}"
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_s > 0 and now - stored_at > self.ttl_s
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        key = self._key(model_name, text)
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            vec, stored_at = item
+            if self._expired(stored_at, time.time()):
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, model_name: str, text: str, vec: np.ndarray) -> None:
+        key = self._key(model_name, text)
+        with self._lock:
+            # copy: a row view would keep its whole encoder batch alive
+            self._data[key] = (np.array(vec, dtype=np.float32), time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "path": str(self.path) if self.path else None,
+        }
+
+    # persistence
+    def load(self) -> int:
+        """Load non-expired entries from `path` (oldest first, so LRU order survives)."""
+        if self.path is None or not self.path.exists():
+            return 0
+        try:
+            with np.load(self.path, allow_pickle=False) as z:
+                keys, vecs, stamps = z["keys"], z["vecs"], z["stamps"]
+        except Exception as exc:
+            log.warning("Could not read embedding cache %s - %s", self.path, exc)
+            return 0
+
+        now = time.time()
+        with self._lock:
+            for key, vec, ts in zip(keys.tolist(), vecs, stamps.tolist()):
+                if not self._expired(ts, now):
+                    self._data[key] = (vec, ts)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        log.info("Loaded %d cached query embeddings from %s", len(self._data), self.path)
+        return len(self._data)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._data:
+                return
+            keys = np.array(list(self._data.keys()))
+            vecs = np.stack([v for v, _ in self._data.values()])
+            stamps = np.array([ts for _, ts in self._data.values()], dtype=np.float64)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp, keys=keys, vecs=vecs, stamps=stamps)
+        tmp.replace(self.path)
+        log.info("Saved %d cached query embeddings to %s", len(keys), self.path)
@@ -0,0 +1,108 @@
+"""
+Shared Postgres access for the API.
+
+One `ConnectionPool` is opened at app startup and closed at shutdown.
+Every pooled connection gets pgvector registered once (in `configure`)
+and prepares statements on first use, so handlers only pay for the query.
+
+Usage
+-----
+    from psycopg.rows import class_row
+    from aipe_api.db import open_pool, fetch_all
+
+    open_pool(dsn, min_size=2, max_size=10, timeout=5.0)
+    hits = fetch_all(sql, params, row_factory=class_row(Hit))
+"""
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+from pgvector.psycopg import register_vector
+
+from aipe_common.metrics import counter, histogram
+
+_pool: Optional[ConnectionPool] = None
+
+POOL_WAIT = histogram("aipe_db_pool_wait_seconds", "Time waiting for a pooled connection")
+QUERY_TIME = histogram("aipe_db_query_seconds", "SQL execute + fetch (incl. GUC setup)")
+ROWS = counter("aipe_db_rows_total", "Rows returned by fetch_all")
+
+
+def _configure(con: psycopg.Connection) -> None:
+    """Run once per new physical connection."""
+    register_vector(con)
+
+
+def open_pool(
+    dsn: str,
+    min_size: int = 2,
+    max_size: int = 10,
+    timeout: float = 5.0,
+    max_waiting: int = 0,
+) -> ConnectionPool:
+    """Create (or return) the process-wide pool.
+
+    `timeout` is how long a request waits for a free connection before
+    failing; `max_waiting` caps the queue of waiting requests (0 = no cap).
+    """
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(
+            dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            max_waiting=max_waiting,
+            configure=_configure,
+            # prepare_threshold=0 -> server-side prepare on first execution
+            kwargs={"autocommit": True, "prepare_threshold": 0},
+            open=True,
+        )
+        _pool.wait()
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+def get_pool() -> ConnectionPool:
+    if _pool is None:
+        raise RuntimeError("Connection pool is not open; call open_pool() first")
+    return _pool
+
+
+def fetch_all(
+    sql: str,
+    params: Optional[Sequence[Any]] = None,
+    row_factory=dict_row,
+    gucs: Optional[Dict[str, str]] = None,
+) -> list:
+    """Run `sql` on a pooled connection and return every row via `row_factory`.
+
+    `gucs` are applied with SET LOCAL semantics inside one transaction, so
+    they never leak into the next request that borrows the connection.
+    """
+    t0 = time.perf_counter()
+    with get_pool().connection() as con:
+        t1 = time.perf_counter()
+        POOL_WAIT.observe(t1 - t0)
+        with con.cursor(row_factory=row_factory) as cur:
+            if not gucs:
+                cur.execute(sql, params, prepare=True)
+                rows = cur.fetchall()
+            else:
+                with con.transaction():
+                    # every setting in one round trip
+                    cur.execute("SELECT " + ", ".join(["set_config(%s, %s, true)"] * len(gucs)),
+                                [x for kv in gucs.items() for x in kv])
+                    cur.execute(sql, params, prepare=True)
+                    rows = cur.fetchall()
+        QUERY_TIME.observe(time.perf_counter() - t1)
+    ROWS.inc(len(rows))
+    return rows
@@ -0,0 +1,145 @@
+"""
+Async micro-batching wrapper around a sync `encode(list[str]) -> ndarray`.
+
+Concurrent requests each `await encoder.encode(text)`; a single background
+task collects texts for at most `window_ms` (or until `max_batch` texts are
+queued), runs ONE encode call in a worker thread and resolves every waiting
+future with its own row.
+
+Usage
+-----
+    enc = BatchingEncoder(lambda xs: model.encode(xs, normalize_embeddings=True),
+                          window_ms=5, max_batch=32)
+    await enc.start()
+    vec = await enc.encode("query: ...")
+    await enc.stop()
+"""
+import asyncio
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from aipe_common.logger import get_logger
+
+log = get_logger(__name__)
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+
+class BatchingEncoder:
+    def __init__(self, encode_fn: EncodeFn, window_ms: float = 5.0, max_batch: int = 32):
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: List[Tuple[str, asyncio.Future, float]] = []    # taken off the queue, unresolved
+
+        # metrics
+        self.n_batches = 0
+        self.n_items = 0
+        self.max_batch_seen = 0
+        self.batch_size_hist: dict = {}
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.encode_total_s = 0.0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._worker(), name="batching-encoder")
+
+    async def stop(self) -> None:
+        """Stop the worker; every request still queued or in flight fails with
+        RuntimeError instead of waiting for its client to time out."""
+        if self._task is not None:
+            self._fail_pending()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._fail_pending()
+            self._task = None
+            self._queue = None
+
+    def _fail_pending(self) -> None:
+        pending = self._inflight
+        self._inflight = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, fut, _ in pending:
+            if not fut.done():
+                fut.set_exception(RuntimeError("encoder stopped"))
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Queue one text and wait for its vector."""
+        if self._queue is None:
+            raise RuntimeError("BatchingEncoder.start() has not been awaited")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future, float]]:
+        """Block for the first item, then gather more until window or max_batch."""
+        first = await self._queue.get()
+        batch = self._inflight = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._collect()
+            texts = [t for t, _, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                vecs = await asyncio.to_thread(self.encode_fn, texts)
+            except Exception as exc:
+                log.error("Batch encode failed (%d texts): %s", len(texts), exc)
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                self._inflight = []
+                continue
+            self._record(batch, t0, time.perf_counter())
+            for (_, fut, _), v in zip(batch, vecs):
+                if not fut.done():
+                    fut.set_result(v)
+            self._inflight = []
+
+    def _record(self, batch: Sequence[Tuple[str, asyncio.Future, float]], t0: float, t1: float) -> None:
+        n = len(batch)
+        self.n_batches += 1
+        self.n_items += n
+        self.max_batch_seen = max(self.max_batch_seen, n)
+        self.batch_size_hist[n] = self.batch_size_hist.get(n, 0) + 1
+        self.encode_total_s += t1 - t0
+        for _, _, enq in batch:
+            w = t0 - enq
+            self.wait_total_s += w
+            self.wait_max_s = max(self.wait_max_s, w)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.n_batches,
+            "items": self.n_items,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": self.n_items / self.n_batches if self.n_batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_hist": dict(sorted(self.batch_size_hist.items())),
+            "avg_queue_wait_ms": 1000.0 * self.wait_total_s / self.n_items if self.n_items else 0.0,
+            "max_queue_wait_ms": 1000.0 * self.wait_max_s,
+            "avg_encode_ms": 1000.0 * self.encode_total_s / self.n_batches if self.n_batches else 0.0,
+        }
@@ -0,0 +1,91 @@
+"""
+Planner for candidate-filtered vector search.
+
+HNSW + `WHERE candidate = ...` post-filters the neighbours the index
+returns, so for a candidate with few chunks most of the `ef_search`
+candidates belong to someone else and fewer than k rows survive.
+Based on the per-candidate row counts we pick, per query:
+
+    exact : small candidate -> disable index scans for the statement so the
+            planner uses the btree on `candidate` + an exact sort
+    hnsw  : larger candidate -> raise `hnsw.ef_search` in proportion to
+            how selective the filter is and turn on iterative scans
+
+Settings are applied with `set_config(..., is_local => true)`, i.e. they
+only last for the query's transaction.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+CountsFn = Callable[[], Dict[str, int]]
+
+PGVECTOR_EF_SEARCH_DEFAULT = 40
+
+
+class CandidateStats:
+    """Per-candidate row counts, refreshed at most every `ttl_s` seconds."""
+
+    def __init__(self, load_counts: CountsFn, ttl_s: float = 300.0):
+        self.load_counts = load_counts
+        self.ttl_s = ttl_s
+        self._counts: Dict[str, int] = {}
+        self._total = 0
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        counts = self.load_counts()
+        self._counts, self._total = counts, sum(counts.values())
+        self._loaded_at = time.monotonic()
+
+    def get(self) -> Dict[str, int]:
+        with self._lock:
+            if not self._loaded_at or time.monotonic() - self._loaded_at > self.ttl_s:
+                self._refresh()
+            return self._counts
+
+    @property
+    def total(self) -> int:
+        self.get()
+        return self._total
+
+
+class FilterPlanner:
+    def __init__(
+        self,
+        stats: CandidateStats,
+        exact_max_rows: int = 2000,
+        ef_search: int = 40,
+        ef_search_max: int = 400,
+        iterative_scan: str = "strict_order",
+    ):
+        self.stats = stats
+        self.exact_max_rows = exact_max_rows
+        self.ef_search = ef_search
+        self.ef_search_max = ef_search_max
+        self.iterative_scan = iterative_scan
+
+    def plan(self, candidate: Optional[str], k: int) -> Dict[str, str]:
+        """Return the GUCs to set for this query (empty = defaults)."""
+        if not candidate:
+            ef = max(self.ef_search, k)
+            # nothing to set (and no transaction round trips) at pgvector's default
+            return {} if ef == PGVECTOR_EF_SEARCH_DEFAULT else {"hnsw.ef_search": str(ef)}
+
+        n = self.stats.get().get(candidate, 0)
+        if n <= self.exact_max_rows:
+            # bitmap scan on the candidate btree + exact sort
+            return {"enable_indexscan": "off"}
+
+        # expected fraction of HNSW neighbours that pass the filter
+        selectivity = n / max(1, self.stats.total)
+        ef = int(min(self.ef_search_max, max(self.ef_search, k) / max(selectivity, 1e-6)))
+        gucs = {
+            "hnsw.ef_search": str(max(ef, k)),
+            # replan with the literal candidate so per-candidate partial indexes match
+            "plan_cache_mode": "force_custom_plan",
+        }
+        if self.iterative_scan != "off":
+            gucs["hnsw.iterative_scan"] = self.iterative_scan
+        return gucs
@@ -0,0 +1,158 @@
+"""
+SQL builders for the vector search endpoints.
+
+`search_mode`
+    exact   : HNSW over the float32 `embedding` column (original behaviour)
+    halfvec : first stage on `embedding::halfvec` index, exact re-rank
+    binary  : first stage on `binary_quantize(embedding)` (Hamming), exact re-rank
+
+The quantized modes fetch `k * rerank_factor` candidates from the small
+index and re-order them by full-precision cosine distance, so the
+returned scores are always exact. HNSW returns at most `hnsw.ef_search`
+rows, so the caller must plan with `first_stage_limit` rather than `k`.
+"""
+from typing import Any, List, Optional, Tuple
+
+EMBED_DIM = 1024
+SEARCH_MODES = ("exact", "halfvec", "binary")
+
+_COLS = 'id, candidate, text, start, "end", video_id'
+
+# first-stage ORDER BY expression + how the query vector is cast for it
+_FIRST_STAGE = {
+    "halfvec": f"embedding::halfvec({EMBED_DIM}) <=> %s::halfvec({EMBED_DIM})",
+    "binary": f"binary_quantize(embedding)::bit({EMBED_DIM}) <~> binary_quantize(%s::vector)",
+}
+
+
+def first_stage_limit(k: int, mode: str = "exact", rerank_factor: int = 4) -> int:
+    """Rows the index scan must return: k, or the re-rank pool for quantized modes."""
+    return k if mode == "exact" else k * max(1, rerank_factor)
+
+
+def search_sql(qv, candidate: Optional[str], k: int, mode: str = "exact",
+               rerank_factor: int = 4) -> Tuple[str, List[Any]]:
+    """Return (sql, params) for a single top-k search."""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+
+    where = "WHERE candidate = %s" if candidate else ""
+    cand = [candidate] if candidate else []
+
+    if mode == "exact":
+        sql = f"""
+            SELECT {_COLS},
+                   1 - (embedding <=> %s) AS score
+            FROM transcript_chunks
+            {where}
+            ORDER BY embedding <=> %s
+            LIMIT %s
+        """
+        return sql, [qv] + cand + [qv, k]
+
+    sql = f"""
+        SELECT {_COLS},
+               1 - (embedding <=> %s) AS score
+        FROM (
+            SELECT {_COLS}, embedding
+            FROM transcript_chunks
+            {where}
+            ORDER BY {_FIRST_STAGE[mode]}
+            LIMIT %s
+        ) c
+        ORDER BY embedding <=> %s
+        LIMIT %s
+    """
+    return sql, [qv] + cand + [qv, first_stage_limit(k, mode, rerank_factor), qv, k]
+
+
+def batch_search_sql(qvs, ks: List[int], candidate: Optional[str] = None, mode: str = "exact",
+                     rerank_factor: int = 4) -> Tuple[str, List[Any]]:
+    """One round trip for many queries that share a candidate filter (or none).
+
+    Unnests the query vectors / k's and runs a LATERAL top-k per row, in
+    `mode` like `search_sql`; `ord` (1-based) ties results to their input.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+
+    where = "WHERE candidate = %s" if candidate else ""
+    cand = [candidate] if candidate else []
+
+    if mode == "exact":
+        inner = f"""
+            SELECT {_COLS}, embedding
+            FROM transcript_chunks
+            {where}
+            ORDER BY embedding <=> q.vec
+            LIMIT q.k
+        """
+    else:
+        inner = f"""
+            SELECT {_COLS}, embedding
+            FROM (
+                SELECT {_COLS}, embedding
+                FROM transcript_chunks
+                {where}
+                ORDER BY {_FIRST_STAGE[mode].replace("%s", "q.vec")}
+                LIMIT q.k * {max(1, int(rerank_factor))}
+            ) c
+            ORDER BY embedding <=> q.vec
+            LIMIT q.k
+        """
+    sql = f"""
+        SELECT q.ord, t.id, t.candidate, t.text, t.start, t."end", t.video_id,
+               1 - (t.embedding <=> q.vec) AS score
+        FROM unnest(%s::vector[], %s::int[]) WITH ORDINALITY AS q(vec, k, ord)
+        CROSS JOIN LATERAL ({inner}) t
+        ORDER BY q.ord, score DESC
+    """
+    return sql, [list(qvs), list(ks)] + cand
+
+
+def hybrid_sql(qv, question: str, candidate: Optional[str], k: int,
+               depth: int = 50, rrf_k: int = 60) -> Tuple[str, List[Any]]:
+    """Vector + Spanish full-text search fused with reciprocal-rank fusion.
+
+    Both rankings are computed in the same statement (one round trip);
+    each contributes `1 / (rrf_k + rank)` for its top `depth` rows.
+    `score` in the result is the fused RRF score, not a cosine similarity.
+    """
+    where = "WHERE candidate = %s" if candidate else ""
+    and_cand = "AND candidate = %s" if candidate else ""
+    cand = [candidate] if candidate else []
+
+    sql = f"""
+        WITH vec AS (
+            SELECT id, row_number() OVER (ORDER BY d) AS rnk
+            FROM (
+                SELECT id, embedding <=> %s AS d
+                FROM transcript_chunks
+                {where}
+                ORDER BY d
+                LIMIT %s
+            ) v
+        ),
+        lex AS (
+            SELECT id, row_number() OVER (ORDER BY r DESC) AS rnk
+            FROM (
+                SELECT id, ts_rank_cd(tsv, q) AS r
+                FROM transcript_chunks, websearch_to_tsquery('spanish', %s) q
+                WHERE tsv @@ q {and_cand}
+                ORDER BY r DESC
+                LIMIT %s
+            ) l
+        ),
+        fused AS (
+            SELECT id, SUM(1.0 / (%s + rnk)) AS score
+            FROM (SELECT * FROM vec UNION ALL SELECT * FROM lex) u
+            GROUP BY id
+        )
+        SELECT t.id, t.candidate, t.text, t.start, t."end", t.video_id,
+               f.score::float8 AS score
+        FROM fused f
+        JOIN transcript_chunks t USING (id)
+        ORDER BY f.score DESC
+        LIMIT %s
+    """
+    return sql, [qv] + cand + [depth, question] + cand + [depth, rrf_k, k]
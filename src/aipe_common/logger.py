@@ -1,34 +1,277 @@
-
 """
 Usage
 -----
-    from aipe_common.logger import get_logger
+    from aipe_common.logger import configure_logging, get_logger
 
+    configure_logging()              # once, in the entry point (CLI, API, script)
     log = get_logger(__name__)
     log.info("Something happened")
+
+Importing this module has no side effects. `configure_logging` puts a
+`QueueHandler` on the root logger, so a log call only merges its arguments
+and enqueues the record; a `QueueListener` thread writes to the console and to one
+rotating file per entry point (`logs/<name>.log`, rolled over by size *and* at
+midnight). Rotation renames the file, so it has a single writer: the process
+holding `logs/<name>.lock`. A concurrent process with the same name (another
+uvicorn worker, a second `aipe-ingest` command) writes `logs/<name>.<pid>.log`.
+
+Until it is called, records go through Python's last-resort handler
+(WARNING and above to stderr). Process pools forward their workers' records
+to the parent's writer:
+
+    ProcessPoolExecutor(..., initializer=init, initargs=(..., worker_logging()))
+
+    def init(..., log_cfg):
+        init_worker_logging(log_cfg)
+
+Environment defaults: AIPE_LOG_LEVEL (INFO), AIPE_LOG_DIR (<repo>/logs),
+AIPE_LOG_JSON (0), AIPE_LOG_FILE (1), AIPE_LOG_RATE (0 = no rate limit).
 """
 
 
 from pathlib import Path
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import multiprocessing as mp
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from typing import Optional
 
 LOG_DIR = Path(__file__).resolve().parents[2]/"logs"
-LOG_DIR.mkdir(exist_ok=True)
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_worker_listener: Optional[logging.handlers.QueueListener] = None
+_worker_queue = None
+_lock_file = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields are included."""
+
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k, v in record.__dict__.items():
+            if k not in self._RESERVED:
+                out[k] = v
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Merge args and render the traceback in the caller; formatting is left
+    to the writer thread, so text and JSON formatters see the same record."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _TRACEBACKS.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_TRACEBACKS = logging.Formatter()
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Numbered backups (`aipe-api.log.1` ...), rolled over once the file exceeds
+    `maxBytes` or, with `daily=True`, at the first record after local midnight."""
+
+    def __init__(self, filename, daily: bool = True, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.daily = daily
+        self._next_rollover = self._next_midnight()
+
+    @staticmethod
+    def _next_midnight() -> float:
+        t = time.localtime()
+        return time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+    def shouldRollover(self, record) -> bool:
+        if self.daily and time.time() >= self._next_rollover:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self._next_rollover = self._next_midnight()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most `per_interval` records per (logger, level, message template)
+    through every `interval_s`; the first record after a suppressed window
+    reports how many were dropped. WARNING and above are never limited.
+    """
+
+    def __init__(self, per_interval: int = 10, interval_s: float = 1.0):
+        super().__init__()
+        self.per_interval = per_interval
+        self.interval_s = interval_s
+        self._windows: dict = {}     # key -> [window_start, passed, dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            w = self._windows.get(key)
+            if w is None or now - w[0] >= self.interval_s:
+                dropped = w[2] if w else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record.msg = f"{record.msg} [{dropped} similar messages suppressed]"
+                return True
+            if w[1] < self.per_interval:
+                w[1] += 1
+                return True
+            w[2] += 1
+            return False
+
+
+def _claim(path: Path):
+    """Non-blocking exclusive lock on `path`; the open file while held, else None."""
+    f = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def configure_logging(
+    name: str = "aipe",
+    level: Optional[str] = None,
+    log_dir: Optional[Path] = None,
+    file: Optional[bool] = None,
+    console: bool = True,
+    json_format: Optional[bool] = None,
+    max_bytes: int = 20 * 2**20,
+    backup_count: int = 10,
+    daily: bool = True,
+    rate_limit: Optional[int] = None,
+    rate_interval_s: float = 1.0,
+) -> None:
+    """Install the queue-based handlers on the root logger (idempotent).
+
+    `name` names the log file (`aipe-api`, `aipe-ingest`, ...).
+    `rate_limit` = max records per message template per `rate_interval_s`
+    below WARNING (0 = off), for log calls inside hot loops.
+    """
+    global _listener, _lock_file
+    with _lock:
+        if _listener is not None:
+            return
+
+        level = level or os.getenv("AIPE_LOG_LEVEL", "INFO")
+        log_dir = Path(log_dir or os.getenv("AIPE_LOG_DIR", LOG_DIR))
+        file = os.getenv("AIPE_LOG_FILE", "1") != "0" if file is None else file
+        json_format = os.getenv("AIPE_LOG_JSON", "0") == "1" if json_format is None else json_format
+        rate_limit = int(os.getenv("AIPE_LOG_RATE", "0")) if rate_limit is None else rate_limit
+
+        formatter = JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+        handlers = []
+        if console:
+            handlers.append(logging.StreamHandler())
+        if file:
+            log_dir.mkdir(parents=True, exist_ok=True)
+            _lock_file = _claim(log_dir / f"{name}.lock")
+            stem = name if _lock_file is not None else f"{name}.{os.getpid()}"
+            handlers.append(SizeAndTimeRotatingFileHandler(
+                log_dir / (f"{stem}.jsonl" if json_format else f"{stem}.log"),
+                daily=daily, maxBytes=max_bytes, backupCount=backup_count,
+                encoding="utf-8", delay=True,
+            ))
+        for h in handlers:
+            h.setFormatter(formatter)
+
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        qh = _QueueHandler(q)
+        if rate_limit > 0:
+            qh.addFilter(RateLimitFilter(rate_limit, rate_interval_s))
+
+        root = logging.getLogger()
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        root.addHandler(qh)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def worker_logging():
+    """Picklable config for `init_worker_logging` in pool workers (None if
+    logging is not configured). Starts a second listener that writes the
+    workers' records through this process's handlers."""
+    global _worker_listener, _worker_queue
+    with _lock:
+        if _listener is None:
+            return None
+        if _worker_listener is None:
+            _worker_queue = mp.get_context("spawn").Queue()
+            _worker_listener = logging.handlers.QueueListener(
+                _worker_queue, *_listener.handlers, respect_handler_level=True)
+            _worker_listener.start()
+        return _worker_queue, logging.getLogger().level
+
+
+def init_worker_logging(cfg) -> None:
+    """Pool initializer side of `worker_logging`: send records to the parent."""
+    if cfg is None:
+        return
+    q, level = cfg
+    root = logging.getLogger()
+    for h in list(root.handlers):     # fork: the parent's handler, whose queue nobody reads here
+        root.removeHandler(h)
+    root.addHandler(_QueueHandler(q))
+    root.setLevel(level)
 
-LOG_FILE = LOG_DIR / f"{datetime.now():%Y_%m_%d_%H_%M_%S}.log"
 
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer threads."""
+    global _listener, _worker_listener, _worker_queue, _lock_file
+    with _lock:
+        if _worker_listener is not None:
+            _worker_listener.stop()
+            _worker_listener = _worker_queue = None
+        if _listener is not None:
+            _listener.stop()
+            for h in _listener.handlers:
+                h.close()
+            _listener = None
+        if _lock_file is not None:
+            _lock_file.close()
+            _lock_file = None
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding="utf-8"),
-        logging.StreamHandler(),
-    ],
-)
 
 def get_logger(name: str = __name__) -> logging.Logger:
     """Return a module-scoped logger that reuses the global handlers."""
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -0,0 +1,203 @@
+"""
+In-process counters, histograms and timers.
+
+Cheap enough for hot paths: an update is one lock, a dict lookup and (for
+histograms) a bisect over fixed buckets. Set AIPE_METRICS=0 to turn every
+update into a no-op.
+
+Usage
+-----
+    from aipe_common.metrics import counter, histogram, timer
+
+    ROWS = counter("aipe_loader_rows_total", "Rows staged")
+    ROWS.inc(len(batch))
+
+    with timer("aipe_db_query_seconds", "SQL execute + fetch", query="search"):
+        ...
+
+    render_prometheus()          # text exposition format, for GET /metrics
+    snapshot()                   # plain dict, for JSON reports
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+ENABLED = os.getenv("AIPE_METRICS", "1") != "0"
+
+# seconds, from sub-millisecond cache hits to multi-minute transcriptions
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    """Full precision: `:g` would print 1234567 as 1.23457e+06 and break rate()."""
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name, self.help = name, help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1, **labels) -> None:
+        if not ENABLED:
+            return
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + n
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def _render(self) -> Iterator[str]:
+        for k, v in sorted(self._values.items()):
+            yield f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}"
+
+    def _snapshot(self) -> Dict:
+        return {_fmt_labels(k) or "": v for k, v in self._values.items()}
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self._data: Dict[LabelKey, list] = {}     # key -> [counts per bucket + inf, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        if not ENABLED:
+            return
+        k = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            d = self._data.get(k)
+            if d is None:
+                d = self._data[k] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            d[0][i] += 1
+            d[1] += value
+            d[2] += 1
+
+    def _quantile(self, counts, total, q: float) -> float:
+        """Upper bucket bound containing the q-quantile (Prometheus-style estimate)."""
+        rank, seen = q * total, 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            seen += c
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def _render(self) -> Iterator[str]:
+        for k, (counts, total, n) in sorted(self._data.items()):
+            cum = 0
+            for bound, c in zip(self.buckets, counts):
+                cum += c
+                yield f"{self.name}_bucket{_fmt_labels(k, ('le', f'{bound:g}'))} {cum}"
+            yield f"{self.name}_bucket{_fmt_labels(k, ('le', '+Inf'))} {n}"
+            yield f"{self.name}_sum{_fmt_labels(k)} {total:.6f}"
+            yield f"{self.name}_count{_fmt_labels(k)} {n}"
+
+    def _snapshot(self) -> Dict:
+        out = {}
+        for k, (counts, total, n) in self._data.items():
+            out[_fmt_labels(k) or ""] = {
+                "count": n, "sum": round(total, 6), "mean": round(total / n, 6) if n else 0.0,
+                "p50": self._quantile(counts, n, 0.5), "p95": self._quantile(counts, n, 0.95),
+            }
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kw):
+        m = self._metrics.get(name)
+        if m is None:
+            with self._lock:
+                m = self._metrics.setdefault(name, cls(name, help, **kw))
+        if not isinstance(m, cls):
+            raise TypeError(f"metric {name!r} already registered as {m.kind}")
+        return m
+
+    def render(self) -> str:
+        lines = []
+        for name, m in sorted(self._metrics.items()):
+            if m.help:
+                lines.append(f"# HELP {name} {m.help}")
+            lines.append(f"# TYPE {name} {m.kind}")
+            lines.extend(m._render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        return {name: m._snapshot() for name, m in sorted(self._metrics.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str = "") -> Counter:
+    return REGISTRY._get(Counter, name, help)
+
+
+def histogram(name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY._get(Histogram, name, help, buckets=buckets)
+
+
+@contextmanager
+def timer(name: str, help: str = "", **labels):
+    """Observe the wall time of the block (seconds) into histogram `name`."""
+    if not ENABLED:
+        yield
+        return
+    h = histogram(name, help)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        h.observe(time.perf_counter() - t0, **labels)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+def snapshot() -> Dict:
+    return REGISTRY.snapshot()
+
+
+def write_report(path, **extra) -> Path:
+    """Write `extra` + the metrics snapshot as JSON (per-stage CLI reports)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = {"written_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **extra, "metrics": snapshot()}
+    path.write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+    return path
@@ -0,0 +1,70 @@
+"""
+Token-budget batching for sentence encoders.
+
+Fixed row-count batches in file order are padded to their longest member.
+Here rows are sorted by length and packed greedily so that
+`rows_in_batch * longest_in_batch <= max_tokens` (the padded size the
+model actually computes); results are scattered back to input order.
+
+Usage
+-----
+    vecs = encode_in_budget(lambda xs: model.encode(xs, ...), texts, lengths, max_tokens=16_384)
+"""
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap length estimate when no token count is stored (~4 chars/token)."""
+    return len(text) // 4 + 1
+
+
+def token_budget_batches(lengths: Sequence[int], max_tokens: int,
+                         max_rows: Optional[int] = None) -> List[np.ndarray]:
+    """Return index arrays (into `lengths`), longest rows first."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    order = np.argsort(-lengths, kind="stable")
+    batches, start = [], 0
+    while start < len(order):
+        longest = max(1, int(lengths[order[start]]))
+        rows = max(1, max_tokens // longest)
+        if max_rows:
+            rows = min(rows, max_rows)
+        batches.append(order[start:start + rows])
+        start += rows
+    return batches
+
+
+def padding_ratio(lengths: Sequence[int], batches: Sequence[Sequence[int]]) -> float:
+    """padded tokens / real tokens (1.0 = no padding)."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    real = padded = 0
+    for b in batches:
+        lb = lengths[np.asarray(b)]
+        real += int(lb.sum())
+        padded += int(lb.max()) * len(lb) if len(lb) else 0
+    return padded / max(1, real)
+
+
+def fixed_batches(n: int, batch_size: int) -> List[np.ndarray]:
+    """The old behaviour: consecutive rows in file order."""
+    return [np.arange(i, min(i + batch_size, n)) for i in range(0, n, batch_size)]
+
+
+def encode_in_budget(encode_fn: Callable[[List[str]], np.ndarray], texts: Sequence[str],
+                     lengths: Optional[Sequence[int]], max_tokens: int,
+                     max_rows: Optional[int] = None) -> np.ndarray:
+    """Encode `texts` in token-budget batches and return vectors in input order."""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    if lengths is None:
+        lengths = [approx_tokens(t) for t in texts]
+
+    out = None
+    for idx in token_budget_batches(lengths, max_tokens, max_rows):
+        vecs = np.asarray(encode_fn([texts[i] for i in idx]), dtype=np.float32)
+        if out is None:
+            out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+        out[idx] = vecs
+    return out
@@ -0,0 +1,142 @@
+"""
+Incremental re-chunking driven by a file manifest.
+
+Output is a directory of per-transcript (= per-video) parquet partitions
+that `pd.read_parquet` / `pyarrow.dataset` read as one table:
+
+    datasets/processed/chunks.parquet/           <- directory in this mode
+        keiko_fujimori_2021_02_28_willax__3fa2c1.parquet
+        ...
+    datasets/processed/chunks.manifest.json
+
+The manifest records, per source file, size / mtime / sha256 and its
+partition, plus the chunker parameters and tokenizer. Only new or changed
+transcripts are re-chunked; partitions of deleted files are removed; a
+different CHUNK_SIZE / CHUNK_OVERLAP / tokenizer invalidates everything.
+"""
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional
+
+import pyarrow.parquet as pq
+
+from aipe_common.logger import get_logger, worker_logging
+from aipe_ingest import chunker
+from aipe_ingest.transcript_store import base_of, find_transcripts
+from aipe_ingest.utils import slugify
+
+log = get_logger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(output: pathlib.Path) -> pathlib.Path:
+    return output.with_name(output.stem + ".manifest.json")
+
+
+def file_sha256(path: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def partition_name(rel_path: str) -> str:
+    stem = base_of(pathlib.Path(rel_path)).name.replace("_cleaned", "")
+    return f"{slugify(stem)[:80]}__{hashlib.sha1(rel_path.encode('utf-8')).hexdigest()[:6]}.parquet"
+
+
+def chunk_to_partition(src: pathlib.Path, dst: pathlib.Path) -> int:
+    """Chunk one transcript and atomically (re)write its partition."""
+    table = chunker.run_table(src)
+    tmp = dst.with_name(f".{dst.name}.tmp")     # dot-files are ignored by dataset readers
+    pq.write_table(table, tmp)
+    os.replace(tmp, dst)
+    return table.num_rows
+
+
+def _params(tokenizer: Optional[str]) -> Dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "chunk_size": chunker.CHUNK_SIZE,
+        "chunk_overlap": chunker.CHUNK_OVERLAP,
+        "tokenizer": tokenizer or "tiktoken:cl100k_base",
+    }
+
+
+def incremental_chunk_all(input_dir: pathlib.Path, output: pathlib.Path,
+                          workers: int = 1, tokenizer: Optional[str] = None) -> Dict[str, int]:
+    """Bring `output` (partition directory) up to date with `input_dir`.
+
+    Returns counts: {"new", "changed", "unchanged", "deleted", "rows"}.
+    """
+    mpath = manifest_path(output)
+    params = _params(tokenizer)
+    manifest = json.loads(mpath.read_text(encoding="utf-8")) if mpath.exists() else {}
+
+    if manifest.get("params") != params or not output.is_dir():
+        if manifest:
+            log.info("Chunker parameters or tokenizer changed -> re-chunking everything")
+        if output.is_dir():
+            shutil.rmtree(output)
+        elif output.exists():
+            output.unlink()     # single-file output from a non-incremental run
+        manifest = {}
+    output.mkdir(parents=True, exist_ok=True)
+
+    old_files: Dict[str, Dict] = manifest.get("files", {})
+    new_files: Dict[str, Dict] = {}
+    todo = []   # (rel, src, dst)
+    counts = {"new": 0, "changed": 0, "unchanged": 0, "deleted": 0, "rows": 0}
+
+    for src in find_transcripts(input_dir):
+        rel = src.relative_to(input_dir).as_posix()
+        st = src.stat()
+        entry = {"size": st.st_size, "mtime": st.st_mtime, "partition": partition_name(rel)}
+        prev = old_files.get(rel)
+        dst = output / entry["partition"]
+
+        if prev and dst.exists() and prev["size"] == st.st_size and prev["mtime"] == st.st_mtime:
+            entry["sha256"] = prev["sha256"]
+            counts["unchanged"] += 1
+        else:
+            entry["sha256"] = file_sha256(src)
+            if prev and dst.exists() and prev["sha256"] == entry["sha256"]:
+                counts["unchanged"] += 1        # touched, same content
+            else:
+                counts["changed" if prev else "new"] += 1
+                todo.append((rel, src, dst))
+        new_files[rel] = entry
+
+    for rel, prev in old_files.items():
+        if rel not in new_files:
+            (output / prev["partition"]).unlink(missing_ok=True)
+            counts["deleted"] += 1
+
+    if todo:
+        if workers <= 1:
+            chunker.init_worker(tokenizer)
+            for rel, src, dst in todo:
+                counts["rows"] += chunk_to_partition(src, dst)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=chunker.init_worker,
+                                     initargs=(tokenizer, worker_logging())) as pool:
+                futs = {pool.submit(chunk_to_partition, src, dst): rel for rel, src, dst in todo}
+                for fut in as_completed(list(futs)):
+                    counts["rows"] += fut.result()
+                    del futs[fut]
+
+    # manifest last: an interrupted run simply redoes the unfinished files
+    tmp = mpath.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"params": params, "files": new_files}, ensure_ascii=False, indent=2),
+                   encoding="utf-8")
+    os.replace(tmp, mpath)
+
+    log.info("Chunk manifest: %(new)d new, %(changed)d changed, %(unchanged)d unchanged, "
+             "%(deleted)d deleted, %(rows)d rows written", counts)
+    return counts
@@ -1,13 +1,21 @@
 import json
 import uuid
+import hashlib
 import pathlib
+import time
+from collections import deque
 
-from typing import Any, Dict, Iterator, List
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 import pandas as pd
+import pyarrow as pa
 import nltk
 import sys
 
+from aipe_ingest import transcript_store
+from aipe_common.logger import init_worker_logging
+from aipe_common.metrics import counter, histogram
+
 def get_tokenizer(model_name: str | None = None):
     if model_name is None:
         import tiktoken
@@ -19,13 +27,45 @@ def get_tokenizer(model_name: str | None = None):
     tok = AutoTokenizer.from_pretrained(model_name, use_fast=True)
     return lambda txt: tok(txt, add_special_tokens=False)["input_ids"]
 
+def get_token_counter(model_name: str | None = None) -> Callable[[List[str]], List[int]]:
+    """Batch variant: one tokenizer call for a list of texts -> token counts."""
+    if model_name is None:
+        import tiktoken
+        enc = tiktoken.get_encoding("cl100k_base")
+        return lambda txts: [len(ids) for ids in enc.encode_ordinary_batch(txts)]
+
+    from transformers import AutoTokenizer
+    tok = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    return lambda txts: [len(ids) for ids in tok(txts, add_special_tokens=False)["input_ids"]] if txts else []
+
 # Default Tokenizer
 TOKENIZER = get_tokenizer()
+COUNT_TOKENS = get_token_counter()
 
 # Chunk-size hyper-parameters
 CHUNK_SIZE = 384
 CHUNK_OVERLAP = 64
 
+# Fixed output schema, so per-file tables can be streamed into one parquet writer
+CHUNK_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("text", pa.string()),
+    ("n_tokens", pa.int64()),
+    ("role", pa.string()),
+    ("start", pa.float64()),
+    ("end", pa.float64()),
+    ("candidate", pa.string()),
+    ("video_id", pa.string()),
+    ("url", pa.string()),
+])
+
+CHUNK_FILE_TIME = histogram("aipe_chunker_file_seconds", "Chunking time per transcript")
+CHUNKS = counter("aipe_chunker_chunks_total", "Chunks produced")
+SEGMENTS = counter("aipe_chunker_segments_total", "Transcript segments chunked")
+
+# Namespace for content-derived chunk ids (uuid5), keep stable across releases
+CHUNK_NAMESPACE = uuid.UUID("6f1c8d7e-2b1a-4e5f-9a0c-3d2e1f4b5a69")
+
 
 
 ## Helper Functions
@@ -39,12 +79,18 @@ def _sentences(text) -> List[str]:
 
     return nltk.sent_tokenize(text, language="spanish")
 
-def _flush(buf: List[str], seg: Dict[str, Any], meta: Dict[str,Any]) -> Dict[str,Any]:
+def chunk_id(video_id: Any, seg_start: Any, idx: int, text: str) -> str:
+    """Deterministic id: same video, segment offset, position and text -> same UUID."""
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(CHUNK_NAMESPACE, f"{video_id}|{seg_start}|{idx}|{digest}"))
+
+def _flush(buf: List[str], seg: Dict[str, Any], meta: Dict[str,Any], idx: int = 0,
+           n_tokens: Optional[int] = None) -> Dict[str,Any]:
     chunk_text = " ".join(buf)
     return {
-        "id": str(uuid.uuid4()),
+        "id": chunk_id(meta.get("video_id"), seg.get("start"), idx, chunk_text),
         "text": chunk_text,
-        "n_tokens": _token_len(chunk_text),
+        "n_tokens": _token_len(chunk_text) if n_tokens is None else n_tokens,
         "role": seg["role"],
         "start": seg["start"],
         "end": seg["end"],
@@ -53,34 +99,55 @@ def _flush(buf: List[str], seg: Dict[str, Any], meta: Dict[str,Any]) -> Dict[str
     }
 
 def chunk_segment(seg: Dict[str, Any], meta: Dict[str,Any], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[Dict[str, Any]]:
-    """ Yield overlapping chunks from one transcript segment"""
-    
-    buf = []
+    """ Yield overlapping chunks from one transcript segment
+
+    Sentences are tokenized once, in a single batch call; the window is a
+    deque of (sentence, n_tokens) with a running sum, so trimming the overlap
+    is O(1) per sentence and `n_tokens` of a chunk is the sum of its
+    sentences (no re-encoding of the joined text).
+    """
+    sents = _sentences(seg["text"])
+    counts = COUNT_TOKENS(sents)
+
+    buf: deque = deque()
     token_count = 0
+    idx = 0
 
-    for sent in _sentences(seg["text"]):
-        sent_tokens = _token_len(sent)
+    for sent, sent_tokens in zip(sents, counts):
 
         if token_count + sent_tokens > chunk_size and buf:
-            yield _flush(buf, seg, meta)
+            yield _flush([s for s, _ in buf], seg, meta, idx, token_count)
+            idx += 1
             while buf and token_count> overlap:
-                token_count -= _token_len(buf.pop(0))
+                token_count -= buf.popleft()[1]
 
         
-        buf.append(sent)
+        buf.append((sent, sent_tokens))
         token_count += sent_tokens
     
     if buf:
-        yield _flush(buf, seg, meta)
+        yield _flush([s for s, _ in buf], seg, meta, idx, token_count)
+
+
 
 
 
+def _load(path: pathlib.Path) -> Dict[str, Any]:
+    """Document keys + segments; from parquet only the needed columns are read."""
+    if path.name.endswith(transcript_store.SEGMENTS_SUFFIX):
+        data = transcript_store.read_meta(path)
+        data["segments"] = transcript_store.read_segments(
+            path, columns=["text", "role", "start", "end"]).to_pylist()
+        return data
+    return json.loads(path.read_text(encoding="utf-8"))
 
 
 # Entry Point
 def run(json_path: pathlib.Path) -> pd.DataFrame:
-    """Convert one *_cleaned.json* file to a DataFrame of chunks."""
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+    """Convert one *_cleaned.json* (or *_cleaned.segments.parquet*) file to a DataFrame of chunks."""
+    t0 = time.perf_counter()
+    data = _load(json_path)
+    stem = transcript_store.base_of(json_path).name
     meta = {
         "candidate": data.get("candidate"),
         "video_id": data.get("video_id"),
@@ -93,10 +160,10 @@ def run(json_path: pathlib.Path) -> pd.DataFrame:
         if role.startswith("candidate_"):
             meta["candidate"] = role.replace("candidate_", "").replace("_", " ").title()
         else:
-            meta["candidate"] = json_path.stem.split("__")[0].replace("_", " ").title()
+            meta["candidate"] = stem.split("__")[0].replace("_", " ").title()
 
     if meta["video_id"] is None:
-        parts = json_path.stem.split("__")
+        parts = stem.split("__")
         if len(parts) >= 2:
             meta["video_id"] = parts[1]
 
@@ -106,9 +173,32 @@ def run(json_path: pathlib.Path) -> pd.DataFrame:
     rows: List[Dict[str, Any]] = []
     for seg in data["segments"]:
         rows.extend(chunk_segment(seg, meta))
+    CHUNK_FILE_TIME.observe(time.perf_counter() - t0)
+    SEGMENTS.inc(len(data["segments"]))
+    CHUNKS.inc(len(rows))
     return pd.DataFrame(rows)
 
 
+def run_table(json_path: pathlib.Path) -> pa.Table:
+    """`run` as an Arrow table with `CHUNK_SCHEMA` (missing columns are null)."""
+    df = run(json_path).reindex(columns=CHUNK_SCHEMA.names)
+    return pa.Table.from_pandas(df, schema=CHUNK_SCHEMA, preserve_index=False)
+
+
+def init_worker(tokenizer_name: Optional[str] = None, log_cfg=None) -> None:
+    """Process-pool initializer: load the tokenizer and punkt model once per worker.
+
+    `log_cfg` (from `aipe_common.logger.worker_logging`) forwards the
+    worker's log records to the parent.
+    """
+    global TOKENIZER, COUNT_TOKENS
+    init_worker_logging(log_cfg)
+    if tokenizer_name is not None:
+        TOKENIZER = get_tokenizer(tokenizer_name)
+        COUNT_TOKENS = get_token_counter(tokenizer_name)
+    _sentences("Hola. Adiós.")   # warms NLTK's cached punkt tokenizer
+
+
 
 if __name__ == "__main__":
     if len(sys.argv) not in (2,3):
@@ -121,6 +211,7 @@ if __name__ == "__main__":
     json_file = pathlib.Path(sys.argv[1])
     if len(sys.argv) == 3:
         TOKENIZER = get_tokenizer(sys.argv[2])
+        COUNT_TOKENS = get_token_counter(sys.argv[2])
     
     df = run(json_file)
     out = json_file.with_suffix(".parquet").with_name("chunks.parquet")
@@ -6,13 +6,21 @@ Commands
 aipe-ingest fetch   : download audio, transcribe & diarize
 aipe-ingest label   : assign candidate / interviewer roles
 aipe-ingest prep    : fetch → label (full preprocessing chain)
+aipe-ingest run     : fetch → label → chunk → embed → load, recomputing only what changed
 """
 
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+from datetime import datetime
+import json
+import time
+import shutil
 import typer, pathlib
-import pandas as pd
+import pyarrow.parquet as pq
 from rich.progress import track  
-from aipe_common.logger import get_logger
+from aipe_common.logger import configure_logging, get_logger, worker_logging
+from aipe_common.metrics import write_report
 from aipe_ingest.pipeline.ingest_pipeline import IngestPipeline
 from aipe_ingest.components.postprocessor import TranscriptCleaner
 from aipe_ingest.config import (
@@ -21,13 +29,40 @@ from aipe_ingest.config import (
     CSV_SOURCES,
     CSV_DIARIZE
 )
-from aipe_ingest.chunker import run as chunk_one
+from aipe_ingest import chunker
+from aipe_ingest.chunk_manifest import incremental_chunk_all, manifest_path
+from aipe_ingest.transcript_store import find_transcripts
 
 
 log = get_logger(__name__)
 app = typer.Typer(add_completion=False)
 
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    metrics_dir: Optional[pathlib.Path] = typer.Option(
+        None, envvar="AIPE_METRICS_DIR",
+        help="Write a JSON report (timings, counters) per command into this directory",
+    ),
+):
+    """AIPE ingestion CLI."""
+    configure_logging("aipe-ingest")
+    ctx.obj = {}    # commands may put a "result" here for the report
+    if metrics_dir is None:
+        return
+    t0 = time.perf_counter()
+    stage = ctx.invoked_subcommand
+
+    def _report():
+        out = metrics_dir / f"{stage}_{datetime.now():%Y_%m_%d_%H_%M_%S}.json"
+        write_report(out, stage=stage, wall_s=round(time.perf_counter() - t0, 3),
+                     result=ctx.obj.get("result"))
+        log.info("Metrics report → %s", out)
+
+    ctx.call_on_close(_report)
+
+
 @app.command("fetch")
 def fetch(
     skip_existing: bool = typer.Option(
@@ -35,9 +70,12 @@ def fetch(
         "--skip-existing/--no-skip-existing",
         help="Skip videos that already have a JSON output",
     ),
+    prefetch: int = typer.Option(
+        0, help="Download up to N items ahead of the transcriber (0 = sequential)"
+    ),
 ):
     """Download from YouTube, then transcribe + diarize with WhisperX."""
-    IngestPipeline().run(skip_existing=skip_existing)
+    IngestPipeline().run(skip_existing=skip_existing, prefetch=prefetch)
 
 
 @app.command("label")
@@ -63,10 +101,11 @@ def prep(
     skip_existing: bool = typer.Option(
         True, "--skip-existing/--no-skip-existing", help="Forwarded to fetch"
     ),
+    prefetch: int = typer.Option(0, help="Forwarded to fetch"),
 ):
     """Convenience wrapper: **fetch** then **label**."""
     log.info("STEP 1/2 — fetch")
-    IngestPipeline().run(skip_existing=skip_existing)
+    IngestPipeline().run(skip_existing=skip_existing, prefetch=prefetch)
 
     log.info("STEP 2/2 — label")
     TranscriptCleaner(
@@ -77,27 +116,98 @@ def prep(
 
 @app.command()
 def chunk_all(
+    ctx: typer.Context,
     input_dir: pathlib.Path = typer.Option(
-        "datasets/processed/cleaned", help="Dir with *_cleaned.json files"
+        "datasets/processed/cleaned", help="Dir with *_cleaned.json / *_cleaned.segments.parquet files"
     ),
     output: pathlib.Path = typer.Option(
         "datasets/processed/chunks.parquet", help="Output parquet"
     ),
+    workers: int = typer.Option(
+        1, "--workers", "-w", help="Chunk files in N processes (1 = in-process)"
+    ),
+    tokenizer: Optional[str] = typer.Option(
+        None, help="HuggingFace tokenizer name (default: tiktoken cl100k_base)"
+    ),
+    incremental: bool = typer.Option(
+        False, "--incremental/--full",
+        help="Only re-chunk new/changed transcripts; OUTPUT becomes a per-video partition directory",
+    ),
 ):
-    dfs=[]
-    files=list(input_dir.rglob("*_cleaned.json"))
+    """Chunk every *_cleaned.json into one parquet, streaming each file's rows to disk."""
+    files = find_transcripts(input_dir)
     if not files:
-        typer.echo("No '*_cleaned.json' files found")
+        typer.echo("No '*_cleaned' transcripts found")
         raise typer.Exit(1)
-    
-    for fp in track(files, description="Chunking"):
-        dfs.append(chunk_one(fp))
 
-    master = pd.concat(dfs, ignore_index = True)
-    output.parent.mkdir(parents=True, exist_ok=True)
-    master.to_parquet(output, index=False)
-    typer.echo(f"Saved {len(master):,} chunks -->> {output}")
+    if incremental:
+        counts = incremental_chunk_all(input_dir, output, workers, tokenizer)
+        ctx.obj["result"] = counts
+        typer.echo(f"{counts['new']} new, {counts['changed']} changed, {counts['unchanged']} unchanged, "
+                   f"{counts['deleted']} deleted -->> {output}")
+        return
 
+    # a full run replaces any partitioned output from --incremental
+    if output.is_dir():
+        shutil.rmtree(output)
+    manifest_path(output).unlink(missing_ok=True)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    n_rows = 0
+    # single writer: peak memory ~ one file's chunks per worker
+    with pq.ParquetWriter(output, chunker.CHUNK_SCHEMA) as writer:
+        if workers <= 1:
+            chunker.init_worker(tokenizer)
+            for fp in track(files, description="Chunking"):
+                table = chunker.run_table(fp)
+                writer.write_table(table)
+                n_rows += table.num_rows
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=chunker.init_worker,
+                initargs=(tokenizer, worker_logging()),
+            ) as pool:
+                futs = {pool.submit(chunker.run_table, fp): fp for fp in files}
+                for fut in track(as_completed(list(futs)), total=len(futs), description=f"Chunking x{workers}"):
+                    table = fut.result()
+                    writer.write_table(table)
+                    n_rows += table.num_rows
+                    del futs[fut]     # a done future keeps its table alive
+
+    ctx.obj["result"] = {"files": len(files), "rows": n_rows, "workers": workers}
+    typer.echo(f"Saved {n_rows:,} chunks -->> {output}")
+
+
+
+@app.command("run")
+def run(
+    ctx: typer.Context,
+    workers: int = typer.Option(4, "--workers", "-w", help="Interviews processed concurrently"),
+    until: str = typer.Option("load", help="Last stage to run: fetch|label|chunk|embed|load"),
+    force: List[str] = typer.Option([], "--force", help="Recompute this stage for every item (repeatable)"),
+    tokenizer: Optional[str] = typer.Option(None, help="Chunker tokenizer (default: tiktoken cl100k_base)"),
+    model: Optional[str] = typer.Option(None, help="Embedding model (default: embedder.DEFAULT_MODEL)"),
+    embed_workers: int = typer.Option(1, help="CPU encoder processes"),
+    max_tokens: int = typer.Option(0, help="Token budget per encoder batch (0 = fixed batches)"),
+    report: Optional[pathlib.Path] = typer.Option(None, help="Also write the stage summary as JSON"),
+):
+    """Run the whole DAG; each stage/item is skipped while its inputs and params are unchanged."""
+    from aipe_ingest.pipeline.dag import IngestDAG, STAGES
+
+    summary = IngestDAG(workers=workers, until=until, force=force, tokenizer=tokenizer,
+                        embed_model=model, embed_workers=embed_workers, max_tokens=max_tokens).run()
+    ctx.obj["result"] = summary
+
+    typer.echo(f"{'stage':8}{'ran':>6}{'cached':>8}{'failed':>8}{'blocked':>9}{'busy s':>10}{'wall s':>10}{'items/s':>10}")
+    for stage in STAGES:
+        r = summary[stage]
+        rate = f"{r['items_per_s']:.3f}" if r["items_per_s"] is not None else "-"
+        typer.echo(f"{stage:8}{r['ran']:>6}{r['cached']:>8}{r['failed']:>8}{r['blocked']:>9}"
+                   f"{r['busy_s']:>10.1f}{r['wall_s']:>10.1f}{rate:>10}")
+    typer.echo(f"{summary['total']['items']} items in {summary['total']['wall_s']:.1f}s")
+    if report:
+        report.write_text(json.dumps(summary, indent=2), encoding="utf-8")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,11 @@
 from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import threading
 import yt_dlp
 
 from aipe_common.logger import get_logger
@@ -6,34 +13,93 @@ from aipe_common.exception import AudioDownloadError
 
 log = get_logger(__name__)
 
+# mp3    : legacy, <file_base>.mp3 re-encoded at 192 kbps
+# native : best audio stream as served (webm/opus, m4a), no re-encode
+# pcm    : raw 16 kHz mono float32 (.f32) - what Whisper consumes, memory-mappable
+# flac   : 16 kHz mono FLAC - lossless and compact, still needs a decode
+AUDIO_FORMATS = ("mp3", "native", "pcm", "flac")
+SAMPLE_RATE = 16_000
+
+_YT_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def video_id(url: str) -> str:
+    """YouTube video ID of `url` (watch?v=, youtu.be/, shorts/, embed/, live/).
+
+    Falls back to a short hash of the URL for anything else, so the cache
+    key is always stable.
+    """
+    u = urlparse(url.strip())
+    host = (u.hostname or "").lower()
+    if host.endswith("youtu.be"):
+        cand = u.path.lstrip("/").split("/")[0]
+    elif "youtube" in host:
+        cand = parse_qs(u.query).get("v", [""])[0]
+        if not cand:
+            parts = [p for p in u.path.split("/") if p]
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                cand = parts[1]
+    else:
+        cand = ""
+    if _YT_ID.match(cand):
+        return cand
+    return "url_" + hashlib.sha1(url.strip().encode("utf-8")).hexdigest()[:16]
+
+
 class AudioDownloader:
     """
-    Download and convert a Youtube video to mp3 file
+    Download the audio track of a Youtube video.
+
+    Parameters
+    ----------
+    ffmpeg_path : str  - Folder containing the ffmpeg binary.
+    output_dir  : Path - Destination of legacy `<file_base>.mp3` files.
+    audio_format: str  - One of AUDIO_FORMATS (default "mp3").
+    cache_dir   : Path - Content-addressed cache (`<video_id>.<ext>`) for the
+                         non-mp3 formats; defaults to `output_dir / "by_id"`.
     """
 
-    def __init__(self, ffmpeg_path:str, output_dir: Path):
+    def __init__(self, ffmpeg_path:str, output_dir: Path, audio_format: str = "mp3",
+                 cache_dir: Path | None = None):
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"audio_format must be one of {AUDIO_FORMATS}, got {audio_format!r}")
         self.ffmpeg_path = ffmpeg_path
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.audio_format = audio_format
+        self.cache_dir = Path(cache_dir) if cache_dir else self.output_dir / "by_id"
+        self._locks: dict = {}
+        self._locks_guard = threading.Lock()
 
 
     def fetch(self, url:str, file_base:str) -> Path:
         """
         Parameters:
-        
+
         url: str - Youtube link
-        file_base: str - Target filename (without extension)
+        file_base: str - Target filename (without extension), used by the "mp3" format
 
         Returns:
-        Path: Absolute path to the '.mp3' file
+        Path: Absolute path to the audio file
 
         """
+        if self.audio_format == "mp3":
+            return self._fetch_mp3(url, file_base)
+
+        vid = video_id(url)
+        # the same video listed under two sources is downloaded once, even when prefetching
+        with self._locks_guard:
+            lock = self._locks.setdefault(vid, threading.Lock())
+        with lock:
+            return self._fetch_cached(url, vid)
+
 
+    def _fetch_mp3(self, url: str, file_base: str) -> Path:
         out_mp3 = self.output_dir / f"{file_base}.mp3"
         if out_mp3.exists():
             log.info("Audio already on disk --> %s",out_mp3)
             return out_mp3
-        
+
         ydl_opts = {
             "format":"bestaudio/best",
             "ffmpeg_location": self.ffmpeg_path,
@@ -53,7 +119,63 @@ class AudioDownloader:
                 ydl.extract_info(url, download=True)
             log.info("Download %s",url)
             return out_mp3
-        
+
+        except Exception as e:
+            log.error("Download failed: %s", url, exc_info=True)
+            raise AudioDownloadError(url) from e
+
+
+    # ---- content-addressed cache -------------------------------------- #
+    def _cached(self, vid: str) -> Path | None:
+        if self.audio_format == "pcm":
+            p = self.cache_dir / f"{vid}.f32"
+        elif self.audio_format == "flac":
+            p = self.cache_dir / f"{vid}.flac"
+        else:
+            p = next((q for q in self.cache_dir.glob(f"{vid}.*")
+                      if ".src." not in q.name
+                      and q.suffix not in (".part", ".tmp", ".ytdl", ".f32", ".flac")), None)
+        return p if p is not None and p.exists() else None
+
+    def _ffmpeg(self) -> str:
+        exe = Path(self.ffmpeg_path) / ("ffmpeg.exe" if os.name == "nt" else "ffmpeg")
+        return str(exe) if exe.exists() else (shutil.which("ffmpeg") or "ffmpeg")
+
+    def _fetch_cached(self, url: str, vid: str) -> Path:
+        hit = self._cached(vid)
+        if hit is not None:
+            log.info("Audio cache hit %s --> %s", vid, hit)
+            return hit
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        ydl_opts = {
+            "format": "bestaudio/best",
+            "ffmpeg_location": self.ffmpeg_path,
+            "outtmpl": str(self.cache_dir / f"{vid}.src.%(ext)s"),
+        }
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=True)
+                src = Path(ydl.prepare_filename(info))
+            log.info("Download %s (%s)", url, vid)
+
+            if self.audio_format == "native":
+                dst = self.cache_dir / f"{vid}{src.suffix}"
+                os.replace(src, dst)
+                return dst
+
+            dst = self.cache_dir / (f"{vid}.f32" if self.audio_format == "pcm" else f"{vid}.flac")
+            tmp = dst.with_name(dst.name + ".tmp")
+            fmt = ["-f", "f32le"] if self.audio_format == "pcm" else ["-f", "flac"]
+            subprocess.run(
+                [self._ffmpeg(), "-nostdin", "-loglevel", "error", "-y", "-i", str(src),
+                 "-ac", "1", "-ar", str(SAMPLE_RATE), *fmt, str(tmp)],
+                check=True,
+            )
+            os.replace(tmp, dst)
+            src.unlink(missing_ok=True)
+            return dst
+
         except Exception as e:
             log.error("Download failed: %s", url, exc_info=True)
-            raise AudioDownloadError(url) from e
\ No newline at end of file
+            raise AudioDownloadError(url) from e
@@ -0,0 +1,90 @@
+import gc
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import torch
+
+from aipe_common.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def _module_mb(obj: Any) -> Optional[float]:
+    """Parameter size of a torch module (or the first module in a tuple)."""
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    params = getattr(obj, "parameters", None)
+    if not callable(params):
+        return None
+    try:
+        return sum(p.numel() * p.element_size() for p in params()) / 2**20
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """
+    Lazily load models once and reuse them across files.
+
+    Models are kept in LRU order; when the total (measured or declared)
+    size exceeds `budget_mb`, the least recently used ones are dropped.
+
+    Parameters
+    ----------
+    budget_mb : float - Memory budget for all cached models (0 = unlimited).
+    """
+
+    def __init__(self, budget_mb: float = 0):
+        self.budget_mb = budget_mb
+        self._models: "OrderedDict[Hashable, list]" = OrderedDict()   # key -> [model, size_mb]
+        self.load_s: dict = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any], size_mb: float = 0) -> Any:
+        """Return the cached model for `key`, loading it with `loader()` on a miss.
+
+        `size_mb` is used when the size cannot be measured (e.g. CTranslate2 models).
+        """
+        if key in self._models:
+            self._models.move_to_end(key)
+            return self._models[key][0]
+
+        cuda = torch.cuda.is_available()
+        before = torch.cuda.memory_allocated() if cuda else 0
+        t0 = time.perf_counter()
+        model = loader()
+        self.load_s[key] = time.perf_counter() - t0
+        self.loads += 1
+
+        measured = (torch.cuda.memory_allocated() - before) / 2**20 if cuda else _module_mb(model)
+        size = measured if measured else size_mb
+        log.info("Loaded %s in %.1fs (~%.0f MB)", key, self.load_s[key], size)
+
+        self._models[key] = [model, size]
+        self._evict(keep=key)
+        return model
+
+    def _evict(self, keep: Hashable) -> None:
+        if self.budget_mb <= 0:
+            return
+        while self.total_mb() > self.budget_mb and len(self._models) > 1:
+            key = next(iter(self._models))
+            if key == keep:
+                break
+            self.drop(key)
+
+    def drop(self, key: Hashable) -> None:
+        if self._models.pop(key, None) is not None:
+            self.evictions += 1
+            log.info("Evicted %s from model registry", key)
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def total_mb(self) -> float:
+        return sum(size for _, size in self._models.values())
+
+    def keys(self):
+        return list(self._models.keys())
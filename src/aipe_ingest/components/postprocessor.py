@@ -1,12 +1,14 @@
-import json
+import os
 from pathlib import Path
 import typing as t
 
 import pandas as pd
+import pyarrow as pa
 from aipe_common.logger import get_logger
 from aipe_common.exception import DataValidationError
 from aipe_ingest.utils import slugify
 from aipe_ingest.config import CSV_DIARIZE
+from aipe_ingest import transcript_store as ts
 
 log = get_logger(__name__)
 
@@ -14,7 +16,9 @@ log = get_logger(__name__)
 class TranscriptCleaner:
     """
     Relabel speakers (candidate vs interviewer vs other) and write
-    `<stem>_cleaned.json` beside / into `clean_dir`.
+    `<stem>_cleaned` beside / into `clean_dir`, as JSON and/or the columnar
+    format of `transcript_store` (`fmt`, default $AIPE_TRANSCRIPT_FORMAT or
+    "parquet"). Raw transcripts may be either format.
 
     Expected CSV columns:
         json_file_name, speaker_candidate, interviewer_1, interviewer_2, ...
@@ -25,10 +29,12 @@ class TranscriptCleaner:
         raw_json_dir: Path,
         csv_path: CSV_DIARIZE, # type: ignore
         clean_dir: Path,
+        fmt: str | None = None,
     ):
         self.raw_dir   = raw_json_dir
         self.csv_path  = csv_path
         self.clean_dir = clean_dir
+        self.fmt       = fmt or os.getenv("AIPE_TRANSCRIPT_FORMAT", "parquet")
         self.clean_dir.mkdir(parents=True, exist_ok=True)
 
         self.meta = pd.read_csv(self.csv_path)
@@ -44,22 +50,37 @@ class TranscriptCleaner:
             return
         
         j_path = self.raw_dir / row["json_file_name"]
-        if not j_path.exists():
-            log.warning("JSON not found: %s", j_path)
+        if not ts.transcript_exists(j_path):
+            log.warning("Transcript not found: %s", j_path)
+            return
+
+        mapping = self._build_mapping(row)
+        out_path = self.clean_dir / f"{ts.base_of(j_path).name}_cleaned.json"
+
+        # parquet -> parquet: relabel the segments table only, words are copied as-is
+        if self.fmt == "parquet" and ts.segments_path(j_path).exists():
+            try:
+                segs = ts.read_segments(j_path)
+            except Exception as exc:
+                raise DataValidationError(f"Bad transcript: {j_path}") from exc
+            speakers = segs.column("speaker").cast(pa.string()).to_pylist()
+            roles = pa.array([mapping.get(str(s), "other") for s in speakers], pa.string())
+            segs = segs.set_column(segs.schema.get_field_index("role"), "role", roles)
+            ts.copy_words(j_path, out_path)
+            out = ts.write_segments(segs, out_path)
+            log.info("Cleaned transcript → %s", out)
             return
 
         try:
-            transcript = json.loads(j_path.read_text(encoding="utf-8"))
+            transcript = ts.load_transcript(j_path)
         except Exception as exc:
-            raise DataValidationError(f"Bad JSON: {j_path}") from exc
+            raise DataValidationError(f"Bad transcript: {j_path}") from exc
 
-        mapping = self._build_mapping(row)
         for seg in transcript.get("segments", []):
             seg["role"] = mapping.get(str(seg.get("speaker")), "other")
 
-        out_path = self.clean_dir / f"{j_path.stem}_cleaned.json"
-        out_path.write_text(json.dumps(transcript, ensure_ascii=False, indent=2), encoding="utf-8")
-        log.info("Cleaned transcript → %s", out_path)
+        out = ts.save_transcript(transcript, out_path, self.fmt)
+        log.info("Cleaned transcript → %s", out)
 
     @staticmethod
     def _build_mapping(row: pd.Series) -> dict[str, str]:
@@ -1,55 +1,306 @@
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
 import torch
 import whisperx
 
-from aipe_common.logger import get_logger
+from aipe_common.logger import get_logger, init_worker_logging, worker_logging
 from aipe_common.exception import TranscriptionError
+from aipe_ingest.components.model_registry import ModelRegistry
 
 log = get_logger(__name__)
 
+# fallback sizes (MB) when the registry cannot measure a model (CPU / CTranslate2)
+MODEL_SIZE_MB = {"asr": 1500, "align": 1300, "diarize": 100}
+
+SAMPLE_RATE = 16_000
+
+
+def silence_cut_points(audio: np.ndarray, window_s: float, search_s: float = 30.0,
+                       frame_s: float = 0.5, sr: int = SAMPLE_RATE) -> list:
+    """Sample offsets that split `audio` into ~`window_s` windows.
+
+    Each cut is moved to the quietest `frame_s` frame (lowest RMS) within
+    ±`search_s` of the nominal boundary, so words are not split mid-way.
+    """
+    n = len(audio)
+    win, search, frame = int(window_s * sr), int(search_s * sr), int(frame_s * sr)
+    cuts = [0]
+    while n - cuts[-1] > win + search:
+        target = cuts[-1] + win
+        lo, hi = max(cuts[-1] + frame, target - search), min(n - frame, target + search)
+        region = audio[lo:hi]
+        n_frames = len(region) // frame
+        if n_frames == 0:
+            cuts.append(target)
+            continue
+        rms = np.sqrt((region[: n_frames * frame].reshape(n_frames, frame) ** 2).mean(axis=1))
+        cuts.append(lo + int(rms.argmin()) * frame + frame // 2)
+    cuts.append(n)
+    return cuts
+
+
+def load_audio(path) -> np.ndarray:
+    """16 kHz mono float32 audio.
+
+    Raw `.f32` files (AudioDownloader, audio_format="pcm") are memory-mapped
+    instead of decoded, so only the pages a window touches are read.
+    Everything else goes through `whisperx.load_audio` (ffmpeg decode).
+    """
+    path = Path(path)
+    if path.suffix == ".f32":
+        return np.memmap(path, dtype="<f4", mode="r")
+    return whisperx.load_audio(str(path))
+
+
+def _decode_to_f32(audio_path: Path, dst: Path) -> Path:
+    """Decode `audio_path` once into raw 16 kHz float32 at `dst` (kept if present)."""
+    if not dst.exists():
+        tmp = dst.with_name(dst.name + ".tmp")
+        load_audio(audio_path).astype("<f4", copy=False).tofile(tmp)
+        os.replace(tmp, dst)
+    return dst
+
+
+def _shift(segments: list, offset: float) -> list:
+    """Move segment and word timestamps of one window to absolute time."""
+    for seg in segments:
+        for key in ("start", "end"):
+            if key in seg and seg[key] is not None:
+                seg[key] = float(seg[key]) + offset
+        for w in seg.get("words", []):
+            for key in ("start", "end"):
+                if key in w and w[key] is not None:
+                    w[key] = float(w[key]) + offset
+    return segments
+
+
+# ---- process-pool workers (windowed mode, CPU) ------------------------- #
+_WORKER = None
+
+
+def _window_worker_init(model_name, language, threads, log_cfg=None):
+    global _WORKER
+    init_worker_logging(log_cfg)
+    torch.set_num_threads(threads)
+    _WORKER = WhisperXTranscriber(model_name, language)
+
+
+def _window_worker(audio_path, lo, hi, ckpt):
+    # `audio_path` is raw .f32: memory-mapped, so only this window is read
+    audio = load_audio(audio_path)
+    return _WORKER._transcribe_window(np.array(audio[lo:hi]), lo / SAMPLE_RATE, ckpt)
+
 class WhisperXTranscriber:
     """
     Wraps WhisperX → alignment → diarization in one method.
 
+    ASR, alignment (per language) and diarization models are loaded lazily
+    through a `ModelRegistry` and reused across files.
+
     Parameters
     ----------
     model_name : str-   WhisperX model (eg. "base", "medium").
     language   : str-   ISO-639-1 language code passed to WhisperX & align model.
+    registry   : ModelRegistry- shared model cache (default: a private one).
+    memory_budget_mb : float- budget for the private registry (0 = unlimited).
+    window_s   : float- > 0 enables windowed, resumable transcription (see `transcribe_windowed`).
+    window_workers : int- CPU processes transcribing windows in parallel.
+    checkpoint_dir : Path- where finished windows are stored.
     """
 
-    def __init__(self, model_name:str ="medium", language: str = "es", hf_token: str | None = None):
+    def __init__(self, model_name:str ="medium", language: str = "es", hf_token: str | None = None,
+                 registry: ModelRegistry | None = None, memory_budget_mb: float = 0,
+                 window_s: float = 0, window_workers: int = 1, checkpoint_dir: Path | None = None):
         self.device   = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model_name = model_name
         self.language = language
         self.hf_token = hf_token
-        self.model    = whisperx.load_model(model_name, device=self.device)
+        self.registry = registry or ModelRegistry(memory_budget_mb)
+        self.last_timings: dict = {}
+        self.window_s = window_s
+        self.window_workers = window_workers
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+
+    def _get(self, key, loader, kind):
+        t0 = time.perf_counter()
+        model = self.registry.get(key, loader, MODEL_SIZE_MB[kind])
+        self.last_timings["load_s"] = self.last_timings.get("load_s", 0.0) + time.perf_counter() - t0
+        return model
+
+    @property
+    def model(self):
+        return self._get(("asr", self.model_name, self.device),
+                         lambda: whisperx.load_model(self.model_name, device=self.device), "asr")
+
+    def _align_model(self, language: str):
+        return self._get(("align", language, self.device),
+                         lambda: whisperx.load_align_model(language_code=language, device=self.device),
+                         "align")
+
+    def _diarize_model(self):
+        return self._get(("diarize", self.device),
+                         lambda: whisperx.diarize.DiarizationPipeline(
+                             use_auth_token=self.hf_token, device=self.device),
+                         "diarize")
 
     def transcribe(self, audio_path:Path, video_url: str) -> dict:
         """Return WhisperX JSON with speaker labels."""
+        if self.window_s > 0:
+            return self.transcribe_windowed(audio_path, video_url)
+        self.last_timings = {"load_s": 0.0, "asr_s": 0.0, "align_s": 0.0, "diarize_s": 0.0}
+        timings = self.last_timings
         try:
             log.info("Transcribing %s", audio_path)
-            audio = whisperx.load_audio(audio_path)
-            result = self.model.transcribe(audio, language = self.language) 
+            audio = load_audio(audio_path)
+            model = self.model
+            t0 = time.perf_counter()
+            result = model.transcribe(audio, language = self.language)
+            timings["asr_s"] = time.perf_counter() - t0
 
-            try: 
-                model_a, meta = whisperx.load_align_model(
-                    language_code=self.language, device=self.device
-                )
+            try:
+                model_a, meta = self._align_model(self.language)
+                t0 = time.perf_counter()
                 result_aligned = whisperx.align(
                     result["segments"], model_a, meta, audio, device=self.device
                 )
+                timings["align_s"] = time.perf_counter() - t0
             except Exception as e:
                 log.warning("Alignment failed for %s - %s", video_url, e)
                 result_aligned = {'segments': result["segments"]}
 
 
             # Diarization
-            diarize_model   = whisperx.diarize.DiarizationPipeline(
-                use_auth_token=self.hf_token, device=self.device
-            )
+            diarize_model   = self._diarize_model()
+            t0 = time.perf_counter()
             diarized_segs = diarize_model(audio)
             final = whisperx.assign_word_speakers(diarized_segs, result_aligned)
+            timings["diarize_s"] = time.perf_counter() - t0
 
+            infer = timings["asr_s"] + timings["align_s"] + timings["diarize_s"]
+            log.info("Timing %s: load %.1fs vs inference %.1fs (asr %.1fs, align %.1fs, diarize %.1fs)",
+                     Path(audio_path).name, timings["load_s"], infer,
+                     timings["asr_s"], timings["align_s"], timings["diarize_s"])
             return final
         except Exception as exc:
             log.exception("Transcription failed for %s (language=%s, device=%s)", audio_path, self.language, self.device)
-            raise TranscriptionError(f"Whisperx failed for {audio_path}") from exc
\ No newline at end of file
+            raise TranscriptionError(f"Whisperx failed for {audio_path}") from exc
+
+    # ---- windowed / resumable mode ------------------------------------ #
+    def _transcribe_window(self, audio: np.ndarray, offset: float, ckpt: Path | None) -> list:
+        """ASR + alignment of one window; segments come back in absolute time."""
+        if ckpt is not None and ckpt.exists():
+            return json.loads(ckpt.read_text(encoding="utf-8"))
+
+        result = self.model.transcribe(audio, language=self.language)
+        try:
+            model_a, meta = self._align_model(self.language)
+            segments = whisperx.align(result["segments"], model_a, meta, audio, device=self.device)["segments"]
+        except Exception as e:
+            log.warning("Alignment failed for window @%.0fs - %s", offset, e)
+            segments = result["segments"]
+
+        segments = _shift(segments, offset)
+        if ckpt is not None:
+            tmp = ckpt.with_suffix(".tmp")
+            tmp.write_text(json.dumps(segments, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, ckpt)
+        return segments
+
+    def transcribe_windowed(self, audio_path: Path, video_url: str) -> dict:
+        """Transcribe long audio window by window, resuming from checkpoints.
+
+        The audio is cut on silence into ~`window_s` windows; each window is
+        transcribed + aligned independently (optionally in `window_workers`
+        CPU processes) and checkpointed under `checkpoint_dir/<stem>/`.
+        Diarization runs once on the full audio so speaker labels are
+        consistent, and is checkpointed too. Output matches `transcribe`.
+
+        Checkpoints only serve to resume a failed run: the directory is keyed
+        by model, language, `window_s` and the audio file's size / mtime, and
+        removed once the transcript is stitched.
+
+        Compressed input is decoded once to a raw `.f32` file next to the
+        checkpoints (a temporary directory without them), which the parent
+        and every worker memory-map: each worker reads only its window and
+        no process holds the decoded array on its heap. Diarization still
+        reads the whole file.
+        """
+        self.last_timings = {"load_s": 0.0, "asr_s": 0.0, "align_s": 0.0, "diarize_s": 0.0}
+        audio_path = Path(audio_path)
+        ckpt_dir = scratch = None
+        try:
+            if self.checkpoint_dir is not None:
+                st = audio_path.stat()
+                key = hashlib.sha1(json.dumps(
+                    [self.model_name, self.language, self.window_s, st.st_size, st.st_mtime_ns]
+                ).encode("utf-8")).hexdigest()[:12]
+                ckpt_dir = self.checkpoint_dir / f"{audio_path.stem}__{key}"
+                ckpt_dir.mkdir(parents=True, exist_ok=True)
+            raw_path = audio_path
+            if audio_path.suffix != ".f32":
+                scratch = ckpt_dir or Path(tempfile.mkdtemp(prefix="aipe-windows-"))
+                raw_path = _decode_to_f32(audio_path, scratch / "audio.f32")
+            audio = load_audio(raw_path)
+            cuts = silence_cut_points(audio, self.window_s)
+            windows = list(zip(cuts[:-1], cuts[1:]))
+
+            ckpts = [ckpt_dir / f"window_{i:03d}_{lo}_{hi}.json" if ckpt_dir else None
+                     for i, (lo, hi) in enumerate(windows)]
+            done = sum(1 for c in ckpts if c is not None and c.exists())
+            log.info("Windowed transcription of %s: %d windows of ~%.0fs (%d already done)",
+                     audio_path.name, len(windows), self.window_s, done)
+
+            t0 = time.perf_counter()
+            if self.window_workers > 1 and self.device == "cpu":
+                threads = max(1, (os.cpu_count() or 1) // self.window_workers)
+                with ProcessPoolExecutor(
+                    max_workers=self.window_workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_window_worker_init,
+                    initargs=(self.model_name, self.language, threads, worker_logging()),
+                ) as pool:
+                    parts = list(pool.map(
+                        _window_worker, [str(raw_path)] * len(windows),
+                        [lo for lo, _ in windows], [hi for _, hi in windows], ckpts,
+                    ))
+            else:
+                parts = [self._transcribe_window(np.array(audio[lo:hi]), lo / SAMPLE_RATE, c)
+                         for (lo, hi), c in zip(windows, ckpts)]
+            self.last_timings["asr_s"] = time.perf_counter() - t0
+
+            stitched = {"segments": [seg for part in parts for seg in part]}
+
+            diar_ckpt = ckpt_dir / "diarization.json" if ckpt_dir else None
+            t0 = time.perf_counter()
+            if diar_ckpt is not None and diar_ckpt.exists():
+                diarized_segs = pd.read_json(diar_ckpt, orient="records")
+            else:
+                diarized_segs = self._diarize_model()(np.array(audio))
+                if diar_ckpt is not None:
+                    diarized_segs[["start", "end", "speaker"]].to_json(diar_ckpt, orient="records")
+            final = whisperx.assign_word_speakers(diarized_segs, stitched)
+            final["word_segments"] = [w for seg in final["segments"] for w in seg.get("words", [])]
+            self.last_timings["diarize_s"] = time.perf_counter() - t0
+
+            log.info("Windowed %s: transcribe+align %.1fs, diarize %.1fs",
+                     audio_path.name, self.last_timings["asr_s"], self.last_timings["diarize_s"])
+            del audio
+            if ckpt_dir is not None:
+                shutil.rmtree(ckpt_dir, ignore_errors=True)
+            return final
+        except Exception as exc:
+            log.exception("Windowed transcription failed for %s", audio_path)
+            raise TranscriptionError(f"Whisperx failed for {audio_path}") from exc
+        finally:
+            # a checkpoint dir keeps the decoded audio for the resumed run
+            if scratch is not None and scratch != ckpt_dir:
+                shutil.rmtree(scratch, ignore_errors=True)
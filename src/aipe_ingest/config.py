@@ -10,8 +10,13 @@ META_DIR  = DATASETS_DIR / "metadata"
 
 # Granular paths
 RAW_AUDIO_DIR   = RAW_DIR  / "audio"      # MP3 files   
+RAW_AUDIO_CACHE = RAW_AUDIO_DIR / "by_id" # <video_id>.{f32,flac,webm,...} (non-mp3 formats)
 RAW_OUTPUT_DIR  = RAW_DIR  / "output"     # whisperx JSON
+RAW_WINDOWS_DIR = RAW_DIR  / "windows"    # per-window checkpoints (windowed transcription)
 PROC_CLEAN_DIR  = PROC_DIR / "cleaned"    # *_cleaned.json
+PROC_CHUNKS_DIR = PROC_DIR / "chunks"     # <file_base>.parquet per interview (aipe-ingest run)
+PROC_EMBED_DIR  = PROC_DIR / "embeddings" # <file_base>.parquet per interview (aipe-ingest run)
+STAGE_CACHE     = PROC_DIR / "stage_cache.json"
 
 CSV_SOURCES = META_DIR / "interview_sources.csv"
 CSV_DIARIZE = META_DIR / "interview_diarize.csv"
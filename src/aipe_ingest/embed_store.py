@@ -0,0 +1,136 @@
+"""
+Persistent, content-addressed embedding store (SQLite).
+
+Rows are keyed by (model name, sha1 of the normalised text), so re-running
+the embedder only encodes texts it has never seen with that model.
+
+Usage
+-----
+    store = EmbeddingStore("datasets/processed/embed_cache.sqlite")
+    keys  = [text_key(t) for t in texts]
+    found = store.get_many(model_name, keys)          # {key: ndarray}
+    store.put_many(model_name, {k: v for k, v in ...})
+
+    python -m aipe_ingest.embed_store stats
+    python -m aipe_ingest.embed_store compact --keep intfloat/multilingual-e5-large
+"""
+import argparse
+import hashlib
+import pathlib
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Mapping
+
+import numpy as np
+
+from aipe_ingest.config import PROC_DIR
+
+DEFAULT_STORE = PROC_DIR / "embed_cache.sqlite"
+
+_WS = re.compile(r"\s+")
+# SQLite default limit on bound parameters is 999 on older builds
+_IN_CHUNK = 900
+
+
+def text_key(text: str) -> str:
+    """sha1 of NFC-normalised text with collapsed whitespace."""
+    norm = _WS.sub(" ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path=DEFAULT_STORE, check_same_thread: bool = True):
+        """`check_same_thread=False` lets callers that serialise access share it across threads."""
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   model     TEXT NOT NULL,
+                   key       TEXT NOT NULL,
+                   dim       INTEGER NOT NULL,
+                   vec       BLOB NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (model, key)
+               ) WITHOUT ROWID"""
+        )
+
+    def close(self) -> None:
+        self.con.close()
+
+    def get_many(self, model: str, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+        for i in range(0, len(keys), _IN_CHUNK):
+            part = keys[i:i + _IN_CHUNK]
+            marks = ",".join("?" * len(part))
+            for key, vec in self.con.execute(
+                f"SELECT key, vec FROM embeddings WHERE model = ? AND key IN ({marks})",
+                [model, *part],
+            ):
+                found[key] = np.frombuffer(vec, dtype=np.float32)
+        if found:
+            now = time.time()
+            with self.con:
+                self.con.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                    [(now, model, k) for k in found],
+                )
+        return found
+
+    def put_many(self, model: str, vecs: Mapping[str, np.ndarray]) -> None:
+        now = time.time()
+        with self.con:
+            self.con.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, dim, vec, last_used) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (model, k, int(v.shape[-1]), np.asarray(v, dtype=np.float32).tobytes(), now)
+                    for k, v in vecs.items()
+                ],
+            )
+
+    def stats(self) -> List[tuple]:
+        return self.con.execute(
+            "SELECT model, COUNT(*), MAX(dim), MAX(last_used) FROM embeddings GROUP BY model"
+        ).fetchall()
+
+    def evict(self, keep_models: Iterable[str] = (), older_than_days: float = 0) -> int:
+        """Drop entries of models not in `keep_models` and/or unused for N days."""
+        keep = list(keep_models)
+        n = 0
+        with self.con:
+            if keep:
+                marks = ",".join("?" * len(keep))
+                n += self.con.execute(f"DELETE FROM embeddings WHERE model NOT IN ({marks})", keep).rowcount
+            if older_than_days > 0:
+                cutoff = time.time() - older_than_days * 86_400
+                n += self.con.execute("DELETE FROM embeddings WHERE last_used < ?", (cutoff,)).rowcount
+        return n
+
+    def compact(self) -> None:
+        self.con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.con.execute("VACUUM")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Inspect / maintain the embedding store")
+    p.add_argument("cmd", choices=["stats", "compact"])
+    p.add_argument("--store", type=pathlib.Path, default=DEFAULT_STORE)
+    p.add_argument("--keep", action="append", default=[],
+                   help="Model name to keep (repeatable); every other model is evicted")
+    p.add_argument("--older-than-days", type=float, default=0,
+                   help="Also evict entries not used for this many days")
+    args = p.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if args.cmd == "compact":
+        removed = store.evict(args.keep, args.older_than_days)
+        store.compact()
+        print(f"Evicted {removed:,} entries; compacted {args.store}")
+    for model, n, dim, last in store.stats():
+        print(f"{model:<50} {n:>10,} vectors  dim={dim}  last_used={time.strftime('%Y-%m-%d', time.localtime(last))}")
+    store.close()
@@ -1,40 +1,306 @@
-import argparse, math, pathlib
+import argparse, json, math, os, pathlib, shutil, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from aipe_ingest.embed_store import EmbeddingStore, DEFAULT_STORE, text_key
+from aipe_ingest.batching import encode_in_budget
+from aipe_common.logger import init_worker_logging, worker_logging
+from aipe_common.metrics import counter, histogram, write_report
+
 DEFAULT_MODEL = "intfloat/multilingual-e5-large"
+# rows per streamed group (unit of output append + checkpoint)
+DEFAULT_GROUP_ROWS = 4096
 
+ENCODE_TIME = histogram("aipe_embedder_encode_seconds", "Encoder call time per flush")
+TEXTS = counter("aipe_embedder_texts_total", "Texts by outcome (store_hit|encoded|duplicate)")
 
-def encode_chunks(in_path, out_path, model_name=DEFAULT_MODEL, batch_size=128):
-    """Read chunk.parquet, write embeddings.parquet with a new column `embedding`"""
-    df = pd.read_parquet(in_path)
+
+def _load_model(model_name):
     print(f"Loading embedding model: {model_name}")
-    model = SentenceTransformer(model_name,
-                                device="cuda" if model_name.endswith('8B') else "cpu")
-    
-    all_vecs = []
-    n_batches = math.ceil(len(df)/batch_size)
-
-    for i in tqdm(range(n_batches), desc="Embedding process"):
-        batch = df["text"][i * batch_size : (i+1) * batch_size].tolist()
-        vecs = model.encode(
-            batch,
-            batch_size=batch_size,
-            normalize_embeddings=True,
-            show_progress_bar=False,
+    return SentenceTransformer(model_name,
+                               device="cuda" if model_name.endswith('8B') else "cpu")
+
+
+def _encode_rows(model, texts, batch_size, lengths=None, max_tokens=0):
+    """Fixed `batch_size` batches, or token-budget batches when `max_tokens` > 0."""
+    def enc(xs):
+        return model.encode(xs, batch_size=len(xs), normalize_embeddings=True, show_progress_bar=False)
+    if max_tokens > 0:
+        return encode_in_budget(enc, texts, lengths, max_tokens, max_rows=batch_size)
+    return np.asarray(model.encode(texts, batch_size=batch_size,
+                                   normalize_embeddings=True, show_progress_bar=False), dtype=np.float32)
+
+
+class LocalEncoder:
+    """Single-process encoder; the model is loaded on first use."""
+
+    def __init__(self, model_name, batch_size, max_tokens=0):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.model = None
+
+    def __call__(self, texts, lengths=None):
+        if self.model is None:
+            self.model = _load_model(self.model_name)
+        if self.max_tokens > 0:
+            return _encode_rows(self.model, texts, self.batch_size, lengths, self.max_tokens)
+        out = []
+        n_batches = math.ceil(len(texts)/self.batch_size)
+        for i in range(n_batches):
+            batch = texts[i * self.batch_size : (i+1) * self.batch_size]
+            out.append(self.model.encode(
+                batch,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            ))
+        return np.asarray(np.concatenate(out), dtype=np.float32)
+
+    def close(self):
+        pass
+
+
+# ---- multi-process CPU encoding --------------------------------------- #
+_WORKER_MODEL = None
+
+
+def _worker_init(model_name, threads, log_cfg=None):
+    global _WORKER_MODEL
+    init_worker_logging(log_cfg)
+    import torch
+    torch.set_num_threads(threads)
+    _WORKER_MODEL = SentenceTransformer(model_name, device="cpu")
+
+
+def _worker_encode(shard_id, texts, batch_size, lengths=None, max_tokens=0):
+    t0, c0 = time.perf_counter(), time.process_time()
+    vecs = _encode_rows(_WORKER_MODEL, texts, batch_size, lengths, max_tokens)
+    return (shard_id, os.getpid(), np.asarray(vecs, dtype=np.float32),
+            time.perf_counter() - t0, time.process_time() - c0)
+
+
+class ParallelEncoder:
+    """Shard texts across `workers` processes, each with its own model copy
+    limited to `threads` torch threads; results come back in input order."""
+
+    def __init__(self, model_name, batch_size, workers, threads=1, max_tokens=0):
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.workers = workers
+        self.threads = threads
+        print(f"Starting {workers} encoder processes x {threads} threads ({model_name})")
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(model_name, threads, worker_logging()),
         )
+        self.wall = 0.0
+        self.n_texts = 0
+        self.per_worker = {}   # pid -> [texts, busy_s, cpu_s]
+
+    def __call__(self, texts, lengths=None):
+        t0 = time.perf_counter()
+        # ~2 shards per worker so a slow shard does not idle the others
+        n_shards = max(1, min(len(texts), self.workers * 2))
+        bounds = np.linspace(0, len(texts), n_shards + 1, dtype=int)
+        futs = [
+            self.pool.submit(_worker_encode, i, texts[lo:hi], self.batch_size,
+                             None if lengths is None else lengths[lo:hi], self.max_tokens)
+            for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])) if hi > lo
+        ]
+        shards = {}
+        for f in futs:
+            sid, pid, vecs, busy, cpu = f.result()
+            shards[sid] = vecs
+            w = self.per_worker.setdefault(pid, [0, 0.0, 0.0])
+            w[0] += len(vecs); w[1] += busy; w[2] += cpu
+        self.wall += time.perf_counter() - t0
+        self.n_texts += len(texts)
+        return np.concatenate([shards[i] for i in sorted(shards)])
+
+    def report(self):
+        print(f"Encoded {self.n_texts:,} texts in {self.wall:.1f}s "
+              f"({self.n_texts / max(self.wall, 1e-9):,.1f} texts/s, {self.workers} workers)")
+        for pid, (n, busy, cpu) in sorted(self.per_worker.items()):
+            print(f"  worker {pid}: {n:,} texts, busy {busy / max(self.wall, 1e-9):.0%} of wall, "
+                  f"cpu {cpu / max(busy * self.threads, 1e-9):.0%} of {self.threads} thread(s)")
+
+    def close(self):
+        self.pool.shutdown()
+        if self.n_texts:
+            self.report()
+
+
+def _make_encoder(model_name, batch_size, workers=1, threads=1, max_tokens=0):
+    if workers > 1:
+        return ParallelEncoder(model_name, batch_size, workers, threads, max_tokens)
+    return LocalEncoder(model_name, batch_size, max_tokens)
+
+
+def _embed_texts(texts, encode, model_name, flush_rows, store=None, progress=True, lengths=None):
+    """Return (len(texts), dim) float32 vectors, encoding only texts missing from `store`.
+
+    New vectors are written to the store every `flush_rows` texts, so a crash
+    keeps progress. Returns (matrix, n_unique, n_encoded).
+    """
+    keys = [text_key(t) for t in texts]
+    known = store.get_many(model_name, keys) if store else {}
 
-        all_vecs.extend(vecs)
+    # unique texts that still need encoding, in first-seen order
+    todo = {}
+    todo_len = {}
+    for j, (k, t) in enumerate(zip(keys, texts)):
+        if k not in known and k not in todo:
+            todo[k] = t
+            if lengths is not None:
+                todo_len[k] = int(lengths[j])
 
-    df["embeddings"] = [np.asarray(v, dtype=np.float32) for v in all_vecs]
+    todo_keys, todo_texts = list(todo.keys()), list(todo.values())
+    todo_lengths = [todo_len[k] for k in todo_keys] if lengths is not None else None
+    for i in tqdm(range(0, len(todo_texts), flush_rows), desc="Embedding process", disable=not progress):
+        t0 = time.perf_counter()
+        vecs = encode(todo_texts[i : i + flush_rows],
+                      None if todo_lengths is None else todo_lengths[i : i + flush_rows])
+        ENCODE_TIME.observe(time.perf_counter() - t0)
+        new = dict(zip(todo_keys[i : i + flush_rows], vecs))
+        known.update(new)
+        if store:
+            store.put_many(model_name, new)
+
+    mat = np.stack([known[k] for k in keys]) if keys else np.empty((0, 0), np.float32)
+    n_unique = len(set(keys))
+    TEXTS.inc(len(todo), outcome="encoded")
+    TEXTS.inc(n_unique - len(todo), outcome="store_hit")
+    TEXTS.inc(len(keys) - n_unique, outcome="duplicate")
+    return mat, n_unique, len(todo)
+
+
+def embed_table(table, encode, model_name, store=None, flush_rows=DEFAULT_GROUP_ROWS, progress=False):
+    """Append a fixed_size_list<float32> `embeddings` column to a chunks table.
+
+    Returns (table, n_unique, n_encoded); see `_embed_texts`.
+    """
+    names = table.schema.names
+    mat, n_unique, n_encoded = _embed_texts(
+        table.column("text").to_pylist(), encode, model_name, flush_rows, store, progress=progress,
+        lengths=table.column("n_tokens").to_pylist() if "n_tokens" in names else None,
+    )
+    dim = mat.shape[1] if mat.size else 0
+    emb = pa.FixedSizeListArray.from_arrays(pa.array(mat.reshape(-1), pa.float32()), dim)
+    return table.append_column("embeddings", emb), n_unique, n_encoded
+
+
+def encode_chunks(in_path, out_path, model_name=DEFAULT_MODEL, batch_size=128, store_path=DEFAULT_STORE,
+                  workers=1, threads=1, max_tokens=0):
+    """Read chunk.parquet, write embeddings.parquet with a new column `embedding`
+
+    Texts already in the embedding store (same model + same normalised text)
+    are not re-encoded; pass `store_path=None` to disable the store.
+    `workers > 1` shards encoding across CPU processes; `max_tokens > 0`
+    packs length-sorted rows (by `n_tokens`) into token-budget batches.
+    """
+    df = pd.read_parquet(in_path)
+    store = EmbeddingStore(store_path) if store_path else None
+    encode = _make_encoder(model_name, batch_size, workers, threads, max_tokens)
+
+    mat, n_unique, n_encoded = _embed_texts(
+        df["text"].tolist(), encode, model_name, batch_size * max(1, workers) * 8, store,
+        lengths=df["n_tokens"].tolist() if "n_tokens" in df.columns else None,
+    )
+    encode.close()
+    if store:
+        store.close()
+    print(f"Embedding store: {n_unique - n_encoded:,} hits, {n_encoded:,} encoded "
+          f"(hit ratio {1 - n_encoded / max(1, n_unique):.1%})")
+
+    df["embeddings"] = list(mat)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_parquet(out_path, index=False)
     print(f"Saved {len(df):,} rows --> {out_path}")
 
+
+def encode_chunks_streaming(in_path, out_path, model_name=DEFAULT_MODEL, batch_size=128,
+                            store_path=DEFAULT_STORE, group_rows=DEFAULT_GROUP_ROWS, workers=1, threads=1,
+                            max_tokens=0):
+    """Bounded-memory, resumable variant of `encode_chunks`.
+
+    The input is read `group_rows` rows at a time; each finished group is
+    written as a part file under `<out>.parts/` with vectors stored as a
+    fixed_size_list<float32> column, and `checkpoint.json` is updated. A
+    re-run with the same input and `group_rows` skips finished groups.
+    Parts are concatenated into `out_path` through one ParquetWriter at the end.
+    """
+    in_path, out_path = pathlib.Path(in_path), pathlib.Path(out_path)
+    parts_dir = out_path.with_suffix(".parts")
+    ckpt_path = parts_dir / "checkpoint.json"
+    st = in_path.stat()
+    fingerprint = {"input": str(in_path.resolve()), "size": st.st_size, "mtime": st.st_mtime,
+                   "model": model_name, "group_rows": group_rows}
+
+    done = 0
+    if ckpt_path.exists():
+        ckpt = json.loads(ckpt_path.read_text(encoding="utf-8"))
+        if ckpt.get("fingerprint") == fingerprint:
+            done = ckpt["groups_done"]
+            print(f"Resuming after {done} finished groups")
+        else:
+            shutil.rmtree(parts_dir)
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    store = EmbeddingStore(store_path) if store_path else None
+    encode = _make_encoder(model_name, batch_size, workers, threads, max_tokens)
+
+    # works for a single file and for a partitioned chunks directory (chunk-all --incremental)
+    dataset = ds.dataset(in_path, format="parquet")
+    n_groups = math.ceil(dataset.count_rows() / group_rows)
+    hits = encoded = 0
+
+    batches = dataset.to_batches(batch_size=group_rows)
+    for g, batch in enumerate(tqdm(batches, total=n_groups, desc="Groups")):
+        if g < done:
+            continue
+        table, n_unique, n_encoded = embed_table(
+            pa.Table.from_batches([batch]), encode, model_name, store, group_rows)
+        hits += n_unique - n_encoded
+        encoded += n_encoded
+        pq.write_table(table, parts_dir / f"part-{g:05d}.parquet")
+
+        ckpt_path.write_text(json.dumps({"fingerprint": fingerprint, "groups_done": g + 1}), encoding="utf-8")
+
+    encode.close()
+    if store:
+        store.close()
+
+    parts = sorted(parts_dir.glob("part-*.parquet"))
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    n_rows = 0
+    writer = None
+    for part in parts:
+        t = pq.read_table(part)
+        if writer is None:
+            writer = pq.ParquetWriter(out_path, t.schema)
+        writer.write_table(t)
+        n_rows += t.num_rows
+    if writer is not None:
+        writer.close()
+    shutil.rmtree(parts_dir)
+
+    print(f"Embedding store: {hits:,} hits, {encoded:,} encoded "
+          f"(hit ratio {hits / max(1, hits + encoded):.1%})")
+    print(f"Saved {n_rows:,} rows --> {out_path}")
+
+
 if __name__ == '__main__':
-    
+
     p = argparse.ArgumentParser(description="Encode transcript chunks into vectors")
     p.add_argument("--input", "-i", dest="parquet_in", default="datasets/processed/chunks.parquet",
                    help="Input chunks Parquet")
@@ -43,11 +309,51 @@ if __name__ == '__main__':
     p.add_argument("--model","-m", default=DEFAULT_MODEL,
                    help="Any SentenceTransformer or HuggingFace embedding model")
     p.add_argument("--batch","-b", type=int, default=128,help="Batch size for model.encode()")
+    p.add_argument("--store", type=pathlib.Path, default=DEFAULT_STORE,
+                   help="SQLite embedding store (content-addressed cache)")
+    p.add_argument("--no-store", action="store_true", help="Encode everything, do not read/write the store")
+    p.add_argument("--stream", action="store_true",
+                   help="Bounded memory: process the input in row groups with checkpoint/resume")
+    p.add_argument("--group-rows", type=int, default=DEFAULT_GROUP_ROWS,
+                   help="Rows per streamed group (with --stream)")
+    p.add_argument("--workers", "-w", type=int, default=1,
+                   help="CPU encoder processes (each loads its own model copy)")
+    p.add_argument("--threads", type=int, default=None,
+                   help="torch threads per worker (with --workers > 1; default: cpu_count // workers)")
+    p.add_argument("--max-tokens", type=int, default=0,
+                   help="Token budget per batch (length-sorted); 0 = fixed --batch rows in file order")
+    p.add_argument("--metrics-report", type=pathlib.Path, default=None,
+                   help="Write timings/counters of this run as JSON")
     args = p.parse_args()
+    if args.threads is None:
+        # one torch thread per core in total, not per worker
+        args.threads = max(1, (os.cpu_count() or 1) // max(1, args.workers))
+    t_start = time.perf_counter()
 
-    encode_chunks(
-        pathlib.Path(args.parquet_in),
-        pathlib.Path(args.parquet_out),
-        args.model,
-        args.batch
-    )
\ No newline at end of file
+    store_path = None if args.no_store else args.store
+    if args.stream:
+        encode_chunks_streaming(
+            pathlib.Path(args.parquet_in),
+            pathlib.Path(args.parquet_out),
+            args.model,
+            args.batch,
+            store_path,
+            args.group_rows,
+            args.workers,
+            args.threads,
+            args.max_tokens,
+        )
+    else:
+        encode_chunks(
+            pathlib.Path(args.parquet_in),
+            pathlib.Path(args.parquet_out),
+            args.model,
+            args.batch,
+            store_path,
+            args.workers,
+            args.threads,
+            args.max_tokens,
+        )
+    if args.metrics_report:
+        write_report(args.metrics_report, stage="embed", wall_s=time.perf_counter() - t_start,
+                     args=vars(args))
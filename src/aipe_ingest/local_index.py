@@ -0,0 +1,159 @@
+"""
+Embedded, in-process vector index (no Postgres needed).
+
+`embeddings.parquet` is converted once into a side-car directory:
+
+    embeddings.index/
+        vectors.npy     contiguous (N, dim) float32 | float16, rows sorted by candidate
+        meta.parquet    id, candidate, text, role, start, end, video_id, n_tokens
+        ranges.json     {candidate: [lo, hi]} + source fingerprint
+
+`vectors.npy` is memory-mapped, so opening is instant and pages are shared
+between processes. Top-k is a matmul + `argpartition`; filtering by
+candidate only scans that candidate's contiguous row range.
+
+Usage
+-----
+    idx = LocalVectorIndex.from_parquet("datasets/processed/embeddings.parquet")
+    hits = idx.search(query_vec, k=5, candidate="Keiko Fujimori")
+
+    python -m aipe_ingest.local_index build datasets/processed/embeddings.parquet --dtype float16
+"""
+import argparse
+import json
+import pathlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from aipe_common.logger import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+META_COLS = ["id", "candidate", "text", "role", "start", "end", "video_id", "n_tokens"]
+# rows per matmul block when the stored matrix is float16
+_BLOCK = 65_536
+
+
+def _embed_col(schema: pa.Schema) -> str:
+    return "embedding" if "embedding" in schema.names else "embeddings"
+
+
+def _to_matrix(col: pa.ChunkedArray, dtype: str) -> np.ndarray:
+    """list<float> / fixed_size_list<float> column -> (N, dim) ndarray."""
+    arr = col.combine_chunks()
+    n = len(arr)
+    flat = arr.flatten().to_numpy(zero_copy_only=False)
+    return np.ascontiguousarray(flat.reshape(n, -1), dtype=dtype)
+
+
+def _fingerprint(path: pathlib.Path) -> Dict[str, Any]:
+    st = path.stat()
+    return {"source": str(path.resolve()), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def build(parquet_path: pathlib.Path, out_dir: Optional[pathlib.Path] = None, dtype: str = "float32") -> pathlib.Path:
+    """Write the side-car index directory for `parquet_path` and return it."""
+    parquet_path = pathlib.Path(parquet_path)
+    out_dir = pathlib.Path(out_dir) if out_dir else parquet_path.with_suffix(".index")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    table = pq.read_table(parquet_path)
+    emb = _embed_col(table.schema)
+    meta_cols = [c for c in META_COLS if c in table.column_names]
+
+    # group rows by candidate so every filter is one contiguous slice
+    order = pc.sort_indices(table, sort_keys=[("candidate", "ascending")])
+    table = table.take(order)
+
+    mat = _to_matrix(table[emb], dtype)
+    np.save(out_dir / "vectors.npy", mat)
+    pq.write_table(table.select(meta_cols), out_dir / "meta.parquet")
+
+    ranges: Dict[str, List[int]] = {}
+    cands = table["candidate"].to_pylist()
+    for i, c in enumerate(cands):
+        if c not in ranges:
+            ranges[c] = [i, i]
+        ranges[c][1] = i + 1
+
+    info = {**_fingerprint(parquet_path), "dtype": dtype, "dim": int(mat.shape[1]), "ranges": ranges}
+    (out_dir / "ranges.json").write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
+    log.info("Built local index: %d x %d %s -> %s", mat.shape[0], mat.shape[1], dtype, out_dir)
+    return out_dir
+
+
+class LocalVectorIndex:
+    def __init__(self, index_dir: pathlib.Path):
+        index_dir = pathlib.Path(index_dir)
+        self.info = json.loads((index_dir / "ranges.json").read_text(encoding="utf-8"))
+        self.vectors: np.ndarray = np.load(index_dir / "vectors.npy", mmap_mode="r")
+        self.meta: pa.Table = pq.read_table(index_dir / "meta.parquet")
+        self.ranges: Dict[str, List[int]] = self.info["ranges"]
+
+    @classmethod
+    def from_parquet(cls, parquet_path, dtype: str = "float32", rebuild: bool = False) -> "LocalVectorIndex":
+        """Open the side-car index, (re)building it if missing or stale."""
+        parquet_path = pathlib.Path(parquet_path)
+        index_dir = parquet_path.with_suffix(".index")
+        info_path = index_dir / "ranges.json"
+        stale = rebuild or not info_path.exists()
+        if not stale:
+            info = json.loads(info_path.read_text(encoding="utf-8"))
+            fp = _fingerprint(parquet_path)
+            stale = any(info.get(k) != fp[k] for k in ("size", "mtime")) or info.get("dtype") != dtype
+        if stale:
+            build(parquet_path, index_dir, dtype)
+        return cls(index_dir)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def counts(self) -> Dict[str, int]:
+        return {c: hi - lo for c, (lo, hi) in self.ranges.items()}
+
+    def _scores(self, lo: int, hi: int, q: np.ndarray) -> np.ndarray:
+        block = self.vectors[lo:hi]
+        if block.dtype == np.float32:
+            return block @ q
+        out = np.empty(hi - lo, dtype=np.float32)
+        for s in range(0, hi - lo, _BLOCK):
+            out[s:s + _BLOCK] = block[s:s + _BLOCK].astype(np.float32) @ q
+        return out
+
+    def search(self, query: Sequence[float], k: int = 5, candidate: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top-k by cosine similarity (vectors are L2-normalised)."""
+        if candidate is None:
+            lo, hi = 0, len(self)
+        elif candidate in self.ranges:
+            lo, hi = self.ranges[candidate]
+        else:
+            return []
+
+        q = np.asarray(query, dtype=np.float32)
+        scores = self._scores(lo, hi, q)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        rows = self.meta.take(pa.array(top + lo)).to_pylist()
+        for r, s in zip(rows, scores[top].tolist()):
+            r["score"] = s
+        return rows
+
+
+if __name__ == "__main__":
+    configure_logging("aipe-ingest")
+    p = argparse.ArgumentParser(description="Build the in-process vector index")
+    p.add_argument("cmd", choices=["build"])
+    p.add_argument("parquet", nargs="?", default="datasets/processed/embeddings.parquet")
+    p.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = p.parse_args()
+
+    out = build(pathlib.Path(args.parquet), dtype=args.dtype)
+    print(f"Index written --> {out}")
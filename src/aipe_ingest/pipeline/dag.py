@@ -0,0 +1,401 @@
+"""
+`aipe-ingest run`: fetch → label → chunk → embed → load as one DAG.
+
+Every interview (row of the sources CSV, keyed by `file_base`) flows through
+the per-item stages fetch → label → chunk → embed; `load` merges all
+changed items into pgvector in one transaction at the end.
+
+For each (stage, item) the stage cache (`datasets/processed/stage_cache.json`)
+records the input fingerprint, the stage parameters, the output path and a
+hash of the output. A stage is skipped when its input fingerprint and
+parameters are unchanged and its output still exists. A stage's input
+fingerprint is the output hash of the stage before it, so a change only
+invalidates what is downstream of it, and a recompute that produces
+identical output stops the cascade there. Outputs that already exist on disk
+for items the cache has never seen (transcripts from `fetch`, cleaned files
+from `label`, ...) are adopted as cached results rather than recomputed.
+
+Items run concurrently on a thread pool (downloads, labelling and chunking
+overlap freely); transcription and embedding each hold one heavy model and
+take one item at a time.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from aipe_common.logger import get_logger
+from aipe_ingest import chunker
+from aipe_ingest import transcript_store as ts
+from aipe_ingest.chunk_manifest import chunk_to_partition, file_sha256, _params as chunk_params
+from aipe_ingest.components.postprocessor import TranscriptCleaner
+from aipe_ingest.config import (
+    CSV_DIARIZE, PROC_CHUNKS_DIR, PROC_CLEAN_DIR, PROC_EMBED_DIR, RAW_OUTPUT_DIR, STAGE_CACHE,
+)
+from aipe_ingest.utils import load_candidate_interviews
+
+log = get_logger(__name__)
+
+STAGES = ("fetch", "label", "chunk", "embed", "load")
+CACHE_VERSION = 1
+
+
+def digest(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _transcript_file(path: Path) -> Optional[Path]:
+    """The file that holds a transcript (parquet segments preferred), if any."""
+    seg = ts.segments_path(path)
+    if seg.exists():
+        return seg
+    base = ts.base_of(path)
+    js = base.with_name(base.name + ".json")
+    return js if js.exists() else None
+
+
+def _output_hash(path: Path) -> str:
+    if path.name.endswith(ts.SEGMENTS_SUFFIX) and ts.words_path(path).exists():
+        return digest([file_sha256(path), file_sha256(ts.words_path(path))])
+    return file_sha256(path)
+
+
+class StageCache:
+    """Thread-safe JSON record of {stage: {item: entry}}, written atomically."""
+
+    def __init__(self, path: Path = STAGE_CACHE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        data = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+        self.stages: Dict[str, Dict[str, Dict]] = (
+            data.get("stages", {}) if data.get("version") == CACHE_VERSION else {})
+
+    def get(self, stage: str, item: str) -> Optional[Dict]:
+        with self._lock:
+            return self.stages.get(stage, {}).get(item)
+
+    def fresh(self, stage: str, item: str, fp: str, params_fp: str) -> Optional[Dict]:
+        """The cached entry if it is still valid for these inputs, else None."""
+        e = self.get(stage, item)
+        if e and e["in"] == fp and e["params"] == params_fp and Path(e["out"]).exists():
+            return e
+        return None
+
+    def put(self, stage: str, item: str, entry: Dict) -> None:
+        with self._lock:
+            self.stages.setdefault(stage, {})[item] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"version": CACHE_VERSION, "stages": self.stages}, indent=1),
+                           encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+class StageStats:
+    """Per-stage counters and busy time; `wall` spans first start → last end."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = {s: {"ran": 0, "cached": 0, "failed": 0, "blocked": 0, "busy_s": 0.0,
+                         "first": None, "last": None} for s in STAGES}
+
+    def record(self, stage: str, outcome: str, t0: float = 0.0, t1: float = 0.0) -> None:
+        with self._lock:
+            r = self.rows[stage]
+            r[outcome] += 1
+            if outcome in ("ran", "failed"):
+                r["busy_s"] += t1 - t0
+                r["first"] = t0 if r["first"] is None else min(r["first"], t0)
+                r["last"] = t1 if r["last"] is None else max(r["last"], t1)
+
+    def summary(self) -> Dict[str, Dict]:
+        out = {}
+        for s, r in self.rows.items():
+            wall = (r["last"] - r["first"]) if r["first"] is not None else 0.0
+            out[s] = {
+                "ran": r["ran"], "cached": r["cached"], "failed": r["failed"], "blocked": r["blocked"],
+                "busy_s": round(r["busy_s"], 2), "wall_s": round(wall, 2),
+                "items_per_s": round(r["ran"] / wall, 3) if wall > 0 else None,
+            }
+        return out
+
+
+class IngestDAG:
+    """
+    Parameters
+    ----------
+    workers     : int - items processed concurrently.
+    until       : str - last stage to run (one of STAGES).
+    force       : list - stages to recompute regardless of the cache.
+    tokenizer   : str - chunker tokenizer (None = tiktoken cl100k_base).
+    embed_model : str - SentenceTransformer model for the embed stage.
+    embed_workers / embed_threads / max_tokens : forwarded to the embedder.
+    """
+
+    def __init__(self, workers: int = 4, until: str = "load", force: Optional[List[str]] = None,
+                 tokenizer: Optional[str] = None, embed_model: Optional[str] = None,
+                 embed_batch: int = 128, embed_workers: int = 1, embed_threads: Optional[int] = None,
+                 max_tokens: int = 0, cache_path: Path = STAGE_CACHE):
+        if until not in STAGES:
+            raise ValueError(f"until must be one of {STAGES}, got {until!r}")
+        self.workers = workers
+        self.stages = STAGES[: STAGES.index(until) + 1]
+        self.force = set(force or [])
+        self.tokenizer = tokenizer
+        self.embed_model = embed_model
+        self.embed_batch = embed_batch
+        self.embed_workers = embed_workers
+        self.embed_threads = embed_threads or max(1, (os.cpu_count() or 1) // max(1, embed_workers))
+        self.max_tokens = max_tokens
+
+        self.cache = StageCache(cache_path)
+        self.stats = StageStats()
+        self._pipeline = None
+        self._encoder = None
+        self._store = None
+        self._chunker_ready = False
+        self._init_lock = threading.Lock()
+        # one item at a time through the stages that hold a single heavy model
+        self._limits = {"embed": threading.Semaphore(1)}
+        self._transcribe_lock = threading.Lock()
+
+        for d in (RAW_OUTPUT_DIR, PROC_CLEAN_DIR, PROC_CHUNKS_DIR, PROC_EMBED_DIR):
+            d.mkdir(parents=True, exist_ok=True)
+        self._cleaner = (TranscriptCleaner(RAW_OUTPUT_DIR, CSV_DIARIZE, PROC_CLEAN_DIR)
+                         if CSV_DIARIZE.exists() else None)
+        # json_file_name -> CSV row (speaker mapping)
+        self._diarize = ({r["json_file_name"]: r for _, r in self._cleaner.meta.iterrows()}
+                         if self._cleaner is not None and "json_file_name" in self._cleaner.meta else {})
+
+    # ---- lazily built heavy components ---------------------------------- #
+    @property
+    def pipeline(self):
+        with self._init_lock:
+            if self._pipeline is None:
+                from aipe_ingest.pipeline.ingest_pipeline import IngestPipeline
+                self._pipeline = IngestPipeline()
+            return self._pipeline
+
+    def _embedder(self):
+        from aipe_ingest import embedder
+        from aipe_ingest.embed_store import EmbeddingStore, DEFAULT_STORE
+        with self._init_lock:
+            if self._encoder is None:
+                self.embed_model = self.embed_model or embedder.DEFAULT_MODEL
+                self._encoder = embedder._make_encoder(
+                    self.embed_model, self.embed_batch, self.embed_workers, self.embed_threads,
+                    self.max_tokens)
+                # used from pool threads, one at a time (embed semaphore)
+                self._store = EmbeddingStore(DEFAULT_STORE, check_same_thread=False)
+            return embedder, self._encoder, self._store
+
+    # ---- stage params --------------------------------------------------- #
+    def _params(self, stage: str, row: Dict) -> Dict:
+        fmt = os.getenv("AIPE_TRANSCRIPT_FORMAT", "parquet")
+        if stage == "fetch":
+            # only what changes the transcript; audio / transcript storage
+            # formats do not (see `_convert_fetched`)
+            return {"model": "medium", "language": "es",
+                    "window_s": os.getenv("WHISPERX_WINDOW_S", "0")}
+        if stage == "label":
+            mapping = self._diarize.get(f"{row['file_base']}.json")
+            mapping = {} if mapping is None else mapping[mapping.notna()].astype(str).to_dict()
+            return {"mapping": mapping, "fmt": fmt}
+        if stage == "chunk":
+            return chunk_params(self.tokenizer)
+        if stage == "embed":
+            from aipe_ingest.embedder import DEFAULT_MODEL
+            return {"model": self.embed_model or DEFAULT_MODEL}
+        return {}
+
+    # ---- stage bodies: produce the output, return its path --------------- #
+    def _fetch(self, row: Dict) -> Path:
+        p = self.pipeline
+        out = RAW_OUTPUT_DIR / f"{row['file_base']}.json"
+        audio = p.downloader.fetch(row["youtube_link"], row["file_base"])
+        with self._transcribe_lock:
+            result = p.transcriber.transcribe(audio, row["youtube_link"])
+        return ts.save_transcript(result, out, p.transcript_format)
+
+    def _label(self, row: Dict) -> Path:
+        self._cleaner._clean_one(self._diarize[f"{row['file_base']}.json"])
+        out = _transcript_file(PROC_CLEAN_DIR / f"{row['file_base']}_cleaned.json")
+        if out is None:
+            raise FileNotFoundError(f"label produced no output for {row['file_base']}")
+        return out
+
+    def _chunk(self, row: Dict, src: Path) -> Path:
+        with self._init_lock:
+            if not self._chunker_ready:
+                chunker.init_worker(self.tokenizer)
+                self._chunker_ready = True
+        dst = PROC_CHUNKS_DIR / f"{row['file_base']}.parquet"
+        chunk_to_partition(src, dst)
+        return dst
+
+    def _embed(self, row: Dict, src: Path) -> Path:
+        embedder, encode, store = self._embedder()
+        dst = PROC_EMBED_DIR / f"{row['file_base']}.parquet"
+        table, n_unique, n_encoded = embedder.embed_table(pq.read_table(src), encode, self.embed_model, store)
+        tmp = dst.with_name(f".{dst.name}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, dst)
+        log.info("Embedded %s: %d unique texts, %d encoded", row["file_base"], n_unique, n_encoded)
+        return dst
+
+    # ---- outputs already on disk (trees built before the stage cache) ----- #
+    @staticmethod
+    def _existing(stage: str, item: str) -> Optional[Path]:
+        if stage == "fetch":
+            return _transcript_file(RAW_OUTPUT_DIR / f"{item}.json")
+        if stage == "label":
+            return _transcript_file(PROC_CLEAN_DIR / f"{item}_cleaned.json")
+        if stage in ("chunk", "embed"):
+            out = (PROC_CHUNKS_DIR if stage == "chunk" else PROC_EMBED_DIR) / f"{item}.parquet"
+            return out if out.exists() else None
+        return None
+
+    def _convert_fetched(self, item: str, entry: Dict) -> Dict:
+        """Bring a cached transcript to the current AIPE_TRANSCRIPT_FORMAT
+        by converting it, instead of transcribing the interview again."""
+        fmt = os.getenv("AIPE_TRANSCRIPT_FORMAT", "parquet")
+        out = Path(entry["out"])
+        json_path = ts.base_of(out).with_name(ts.base_of(out).name + ".json")
+        want = [ts.segments_path(out)] if fmt in ("parquet", "both") else []
+        want += [json_path] if fmt in ("json", "both") else []
+        if want[-1] == out and all(p.exists() for p in want):
+            return entry
+        new_out = ts.save_transcript(ts.load_transcript(out), json_path, fmt)
+        entry = dict(entry, out=str(new_out), out_hash=_output_hash(new_out))
+        self.cache.put("fetch", item, entry)
+        log.info("fetch: converted %s to %s", out.name, fmt)
+        return entry
+
+    # ---- driver ---------------------------------------------------------- #
+    def _step(self, stage: str, item: str, fp: str, row: Dict, body,
+              adopt: bool = False) -> Optional[Dict]:
+        """Run one (stage, item) unless cached; returns the cache entry or None on failure.
+
+        With `adopt`, an output already on disk for an item the cache has never
+        seen is recorded as this stage's result instead of being recomputed, so
+        the first `run` on an existing tree does not re-download and re-transcribe
+        everything. Callers pass it only while every upstream stage was itself a
+        cache hit or adopted.
+        """
+        params_fp = digest(self._params(stage, row))
+        if stage not in self.force:
+            hit = self.cache.fresh(stage, item, fp, params_fp)
+            if hit:
+                self.stats.record(stage, "cached")
+                return hit
+            existing = self._existing(stage, item) if adopt and self.cache.get(stage, item) is None else None
+            if existing is not None:
+                entry = {"in": fp, "params": params_fp, "out": str(existing),
+                         "out_hash": _output_hash(existing), "seconds": 0.0, "at": time.time(),
+                         "adopted": True}
+                self.cache.put(stage, item, entry)
+                self.stats.record(stage, "cached")
+                log.info("%s: adopted existing %s for %s", stage, existing.name, item)
+                return entry
+
+        sem = self._limits.get(stage)
+        t0 = time.perf_counter()
+        try:
+            if sem:
+                sem.acquire()
+                t0 = time.perf_counter()    # waiting for the model is not stage time
+            out = Path(body())
+            entry = {"in": fp, "params": params_fp, "out": str(out), "out_hash": _output_hash(out),
+                     "seconds": round(time.perf_counter() - t0, 3), "at": time.time()}
+        except Exception as exc:
+            self.stats.record(stage, "failed", t0, time.perf_counter())
+            log.error("%s failed for %s - %s", stage, item, exc)
+            return None
+        finally:
+            if sem:
+                sem.release()
+        self.stats.record(stage, "ran", t0, time.perf_counter())
+        self.cache.put(stage, item, entry)
+        return dict(entry, ran=True)
+
+    def _run_item(self, row: Dict) -> Optional[Dict]:
+        """fetch → label → chunk → embed for one item; returns the embed entry, if reached."""
+        item = row["file_base"]
+        entry = self._step("fetch", item, digest({"url": row["youtube_link"]}), row,
+                           lambda: self._fetch(row), adopt=True)
+        if entry is None:
+            return None
+        if not entry.get("ran"):
+            try:
+                entry = self._convert_fetched(item, entry)
+            except Exception as exc:
+                log.error("fetch: converting %s failed - %s", item, exc)
+                return None
+        if "label" not in self.stages:
+            return None
+        if f"{item}.json" not in self._diarize:
+            self.stats.record("label", "blocked")     # no speaker mapping yet
+            return None
+
+        for stage, body in (("label", lambda e: self._label(row)),
+                            ("chunk", lambda e: self._chunk(row, Path(e["out"]))),
+                            ("embed", lambda e: self._embed(row, Path(e["out"])))):
+            if stage not in self.stages:
+                return None
+            prev = entry
+            entry = self._step(stage, item, prev["out_hash"], row, lambda: body(prev),
+                               adopt=not prev.get("ran"))
+            if entry is None:
+                return None
+        return entry
+
+    def _load(self, embedded: Dict[str, Dict]) -> None:
+        """Merge the embeddings of items whose output changed since the last load."""
+        from aipe_ingest import db_loader
+        todo = {item: e for item, e in embedded.items()
+                if "load" in self.force or not self.cache.fresh("load", item, e["out_hash"], digest({}))}
+        self.stats.rows["load"]["cached"] = len(embedded) - len(todo)
+        if not todo:
+            return
+        t0 = time.perf_counter()
+        try:
+            db_loader.load([e["out"] for e in todo.values()], incremental=True)
+        except Exception as exc:
+            for _ in todo:
+                self.stats.record("load", "failed", t0, time.perf_counter())
+            log.error("load failed - %s", exc)
+            return
+        t1 = time.perf_counter()
+        for item, e in todo.items():
+            self.stats.record("load", "ran", t0, t1)
+            self.cache.put("load", item, {"in": e["out_hash"], "params": digest({}), "out": e["out"],
+                                          "out_hash": e["out_hash"], "seconds": round(t1 - t0, 3),
+                                          "at": time.time()})
+
+    def run(self) -> Dict[str, Dict]:
+        rows = load_candidate_interviews()
+        embedded: Dict[str, Dict] = {}
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dag") as pool:
+            futs = {pool.submit(self._run_item, r): r["file_base"] for r in rows}
+            for fut in as_completed(futs):
+                entry = fut.result()
+                if entry is not None:
+                    embedded[futs[fut]] = entry
+
+        if "load" in self.stages:
+            self._load(embedded)
+        if self._encoder is not None:
+            self._encoder.close()
+            self._store.close()
+
+        summary = self.stats.summary()
+        summary["total"] = {"items": len(rows), "wall_s": round(time.perf_counter() - t0, 2)}
+        return summary
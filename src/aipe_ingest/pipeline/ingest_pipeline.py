@@ -1,16 +1,20 @@
 from pathlib import Path
-import os, pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import os, queue, threading, time, pandas as pd
 from dotenv import load_dotenv
 
 from aipe_common.logger import get_logger
 from aipe_ingest.components.audio_downloader import AudioDownloader
 from aipe_ingest.components.transcriber import WhisperXTranscriber
-from aipe_ingest.utils import save_as_json, load_candidate_interviews
-from aipe_ingest.config import RAW_AUDIO_DIR, RAW_OUTPUT_DIR
+from aipe_ingest.utils import load_candidate_interviews
+from aipe_ingest.transcript_store import save_transcript, transcript_exists
+from aipe_ingest.config import RAW_AUDIO_DIR, RAW_AUDIO_CACHE, RAW_OUTPUT_DIR, RAW_WINDOWS_DIR
 
 log = get_logger(__name__)
 load_dotenv()
 
+_DONE = object()
+
 class IngestPipeline:
     """End-to-end audio → diarised JSON."""
 
@@ -19,27 +23,144 @@ class IngestPipeline:
         self.downloader = AudioDownloader(
             ffmpeg_path=ffmpeg_path,
             output_dir=RAW_AUDIO_DIR,
+            # mp3 (default) | native | pcm | flac - see audio_downloader.AUDIO_FORMATS
+            audio_format=os.getenv("AIPE_AUDIO_FORMAT", "mp3"),
+            cache_dir=RAW_AUDIO_CACHE,
         )
         self.transcriber = WhisperXTranscriber(
             model_name="medium",
             language="es",
             hf_token=os.getenv("HF_AUTH_TOKEN"),
+            memory_budget_mb=float(os.getenv("WHISPERX_MODEL_BUDGET_MB", "0")),
+            # WHISPERX_WINDOW_S > 0: windowed, resumable transcription of long interviews
+            window_s=float(os.getenv("WHISPERX_WINDOW_S", "0")),
+            window_workers=int(os.getenv("WHISPERX_WINDOW_WORKERS", "1")),
+            checkpoint_dir=RAW_WINDOWS_DIR,
         )
         self.out_dir = RAW_OUTPUT_DIR
         self.out_dir.mkdir(parents=True, exist_ok=True)
+        # json | parquet | both - see aipe_ingest.transcript_store
+        self.transcript_format = os.getenv("AIPE_TRANSCRIPT_FORMAT", "parquet")
 
 
-    def run(self, skip_existing: bool = True):
+    def _pending(self, skip_existing: bool):
         meta = pd.DataFrame(load_candidate_interviews())
         for _, row in meta.iterrows():
-            file_base = row["file_base"]
-            out_json  = self.out_dir / f"{file_base}.json"
-
-            if skip_existing and out_json.exists():
-                log.info("Skipping %s (already done)", file_base)
+            out_json = self.out_dir / f"{row['file_base']}.json"
+            if skip_existing and transcript_exists(out_json):
+                log.info("Skipping %s (already done)", row["file_base"])
                 continue
+            yield row, out_json
+
+
+    def run(self, skip_existing: bool = True, prefetch: int = 0):
+        """Process every pending interview.
+
+        prefetch = 0 : download → transcribe strictly one after another.
+        prefetch > 0 : pipelined; see `_run_pipelined`.
+        """
+        if prefetch > 0:
+            return self._run_pipelined(skip_existing, prefetch)
 
-            audio = self.downloader.fetch(row["youtube_link"], file_base)
+        for row, out_json in self._pending(skip_existing):
+            audio = self.downloader.fetch(row["youtube_link"], row["file_base"])
             result = self.transcriber.transcribe(audio, row["youtube_link"])
-            save_as_json(result, out_json)
-            log.info("Saved → %s", out_json)
+            saved = save_transcript(result, out_json, self.transcript_format)
+            log.info("Saved → %s", saved)
+
+
+    def _timed_fetch(self, row):
+        t0 = time.perf_counter()
+        audio = self.downloader.fetch(row["youtube_link"], row["file_base"])
+        return audio, time.perf_counter() - t0
+
+
+    def _run_pipelined(self, skip_existing: bool, prefetch: int) -> dict:
+        """Overlap downloads with transcription.
+
+        A producer thread submits downloads to a `prefetch`-thread pool and
+        puts the futures on a queue bounded to `prefetch` items, so at most
+        that many downloads run ahead of the transcriber. Per-item failures
+        are recorded and the run continues.
+        """
+        q: queue.Queue = queue.Queue(maxsize=prefetch)
+        stats = {
+            "items": 0, "ok": 0, "failures": [],
+            "download_s": 0.0, "transcribe_s": 0.0, "save_s": 0.0,
+            "transcriber_wait_s": 0.0, "producer_block_s": 0.0,
+            "queue_samples": [],
+        }
+
+        prod_exc = []
+
+        def producer(pool):
+            try:
+                for row, out_json in self._pending(skip_existing):
+                    fut = pool.submit(self._timed_fetch, row)
+                    t0 = time.perf_counter()
+                    q.put((row, out_json, fut))
+                    stats["producer_block_s"] += time.perf_counter() - t0
+            except BaseException as exc:
+                # a bad sources CSV or a closed pool: stop feeding, let the
+                # transcriber drain what is queued, re-raise below
+                prod_exc.append(exc)
+            finally:
+                q.put(_DONE)
+
+        t_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="download") as pool:
+            prod = threading.Thread(target=producer, args=(pool,), name="ingest-producer", daemon=True)
+            prod.start()
+
+            while True:
+                stats["queue_samples"].append(q.qsize())
+                item = q.get()
+                if item is _DONE:
+                    break
+                row, out_json, fut = item
+                file_base = row["file_base"]
+                stats["items"] += 1
+
+                t0 = time.perf_counter()
+                try:
+                    audio, dl_s = fut.result()
+                    stats["download_s"] += dl_s
+                except Exception as exc:
+                    log.error("Download failed for %s - %s", file_base, exc)
+                    stats["failures"].append({"file_base": file_base, "stage": "download", "error": str(exc)})
+                    continue
+                finally:
+                    stats["transcriber_wait_s"] += time.perf_counter() - t0
+
+                try:
+                    t0 = time.perf_counter()
+                    result = self.transcriber.transcribe(audio, row["youtube_link"])
+                    t1 = time.perf_counter()
+                    saved = save_transcript(result, out_json, self.transcript_format)
+                    stats["transcribe_s"] += t1 - t0
+                    stats["save_s"] += time.perf_counter() - t1
+                    stats["ok"] += 1
+                    log.info("Saved → %s", saved)
+                except Exception as exc:
+                    log.error("Transcription failed for %s - %s", file_base, exc)
+                    stats["failures"].append({"file_base": file_base, "stage": "transcribe", "error": str(exc)})
+
+            prod.join()
+
+        stats["wall_s"] = time.perf_counter() - t_start
+        samples = stats.pop("queue_samples")
+        stats["queue_mean"] = sum(samples) / len(samples) if samples else 0.0
+        stats["queue_max"] = max(samples, default=0)
+
+        log.info(
+            "Pipeline: %d/%d ok in %.0fs | download %.0fs, transcribe %.0fs, save %.0fs, "
+            "transcriber idle %.0fs | queue mean %.1f / max %d of %d",
+            stats["ok"], stats["items"], stats["wall_s"], stats["download_s"], stats["transcribe_s"],
+            stats["save_s"], stats["transcriber_wait_s"], stats["queue_mean"], stats["queue_max"], prefetch,
+        )
+        for f in stats["failures"]:
+            log.warning("FAILED %(file_base)s at %(stage)s: %(error)s", f)
+        if prod_exc:
+            log.error("Producer stopped early - %s", prod_exc[0])
+            raise prod_exc[0]
+        return stats
@@ -0,0 +1,259 @@
+"""
+Columnar transcript format shared by the ingest stages.
+
+A WhisperX / cleaned transcript `X.json` is stored as two parquet files:
+
+    X.segments.parquet   seg_id, start, end, speaker, role, text
+    X.words.parquet      seg_id, word, start, end, score, speaker
+
+Document-level keys (candidate, video_id, url, language, ...) live in the
+parquet schema metadata, so `read_meta` does not touch any column data.
+Readers pick columns: the chunker reads only text / role / start / end of
+the segments file and never opens the (much larger) words file.
+
+`load_transcript` returns the JSON-shaped dict for either format, so every
+stage accepts old `.json` files and new parquet ones alike.
+
+CLI
+---
+    python -m aipe_ingest.transcript_store convert datasets/raw/output [--remove-json]
+"""
+import argparse
+import json
+import os
+import pathlib
+import shutil
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aipe_common.logger import configure_logging, get_logger
+
+log = get_logger(__name__)
+
+TRANSCRIPT_FORMATS = ("json", "parquet", "both")
+META_KEY = b"aipe_transcript"
+SEGMENTS_SUFFIX = ".segments.parquet"
+WORDS_SUFFIX = ".words.parquet"
+
+SEGMENT_SCHEMA = pa.schema([
+    ("seg_id", pa.int32()),
+    ("start", pa.float64()),
+    ("end", pa.float64()),
+    ("speaker", pa.dictionary(pa.int8(), pa.string())),
+    ("role", pa.dictionary(pa.int8(), pa.string())),
+    ("text", pa.string()),
+])
+
+WORD_SCHEMA = pa.schema([
+    ("seg_id", pa.int32()),
+    ("word", pa.string()),
+    ("start", pa.float64()),
+    ("end", pa.float64()),
+    ("score", pa.float64()),
+    ("speaker", pa.dictionary(pa.int8(), pa.string())),
+])
+
+
+# ---- paths -------------------------------------------------------------- #
+def base_of(path: pathlib.Path) -> pathlib.Path:
+    """`X.json`, `X.segments.parquet`, `X.words.parquet` -> `X`."""
+    path = pathlib.Path(path)
+    for suffix in (SEGMENTS_SUFFIX, WORDS_SUFFIX, ".json"):
+        if path.name.endswith(suffix):
+            return path.with_name(path.name[: -len(suffix)])
+    return path
+
+
+def segments_path(path: pathlib.Path) -> pathlib.Path:
+    base = base_of(path)
+    return base.with_name(base.name + SEGMENTS_SUFFIX)
+
+
+def words_path(path: pathlib.Path) -> pathlib.Path:
+    base = base_of(path)
+    return base.with_name(base.name + WORDS_SUFFIX)
+
+
+def transcript_exists(path: pathlib.Path) -> bool:
+    """True if `X.json` or its parquet counterpart exists."""
+    base = base_of(path)
+    return base.with_name(base.name + ".json").exists() or segments_path(base).exists()
+
+
+def find_transcripts(directory: pathlib.Path, suffix: str = "_cleaned") -> List[pathlib.Path]:
+    """One path per transcript under `directory` (parquet preferred over JSON)."""
+    found: Dict[pathlib.Path, pathlib.Path] = {}
+    for p in directory.rglob(f"*{suffix}.json"):
+        found.setdefault(base_of(p), p)
+    for p in directory.rglob(f"*{suffix}{SEGMENTS_SUFFIX}"):
+        found[base_of(p)] = p
+    return sorted(found.values())
+
+
+# ---- dict <-> tables ---------------------------------------------------- #
+def _f(v) -> Optional[float]:
+    return None if v is None else float(v)
+
+
+def to_tables(data: Dict[str, Any]) -> Tuple[pa.Table, pa.Table]:
+    """Split a WhisperX-shaped dict into (segments, words) tables."""
+    seg_cols: Dict[str, list] = {n: [] for n in SEGMENT_SCHEMA.names}
+    word_cols: Dict[str, list] = {n: [] for n in WORD_SCHEMA.names}
+
+    for i, seg in enumerate(data.get("segments", [])):
+        seg_cols["seg_id"].append(i)
+        seg_cols["start"].append(_f(seg.get("start")))
+        seg_cols["end"].append(_f(seg.get("end")))
+        seg_cols["speaker"].append(seg.get("speaker"))
+        seg_cols["role"].append(seg.get("role"))
+        seg_cols["text"].append(seg.get("text", ""))
+        for w in seg.get("words", []):
+            word_cols["seg_id"].append(i)
+            word_cols["word"].append(w.get("word"))
+            word_cols["start"].append(_f(w.get("start")))
+            word_cols["end"].append(_f(w.get("end")))
+            word_cols["score"].append(_f(w.get("score")))
+            word_cols["speaker"].append(w.get("speaker"))
+
+    meta = {k: v for k, v in data.items() if k not in ("segments", "word_segments")}
+    md = {META_KEY: json.dumps(meta, ensure_ascii=False).encode("utf-8")}
+    segs = pa.Table.from_pydict(seg_cols, schema=SEGMENT_SCHEMA).replace_schema_metadata(md)
+    words = pa.Table.from_pydict(word_cols, schema=WORD_SCHEMA).replace_schema_metadata(md)
+    return segs, words
+
+
+def _strip_none(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in d.items() if v is not None}
+
+
+def from_tables(segs: pa.Table, words: Optional[pa.Table], meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of `to_tables`: rebuild the JSON-shaped dict."""
+    seg_ids = segs.column("seg_id").to_pylist()
+    segments = [_strip_none(s) for s in segs.drop(["seg_id"]).to_pylist()]
+    if words is not None:
+        # words are written grouped by seg_id in segment order
+        w_ids = words.column("seg_id").to_numpy()
+        rows = [_strip_none(w) for w in words.drop(["seg_id"]).to_pylist()]
+        lo = np.searchsorted(w_ids, seg_ids, side="left")
+        hi = np.searchsorted(w_ids, seg_ids, side="right")
+        for s, a, b in zip(segments, lo, hi):
+            s["words"] = rows[a:b]
+    out = dict(meta)
+    out["segments"] = segments
+    if words is not None:
+        out["word_segments"] = [w for s in segments for w in s["words"]]
+    return out
+
+
+# ---- write / read ------------------------------------------------------- #
+def _atomic_write(table: pa.Table, dst: pathlib.Path) -> None:
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, dst)
+
+
+def write_transcript(data: Dict[str, Any], path: pathlib.Path) -> pathlib.Path:
+    """Write `data` as `<base>.segments.parquet` + `<base>.words.parquet`."""
+    segs, words = to_tables(data)
+    _atomic_write(words, words_path(path))
+    _atomic_write(segs, segments_path(path))      # segments last: it marks the transcript as present
+    return segments_path(path)
+
+
+def save_transcript(data: Dict[str, Any], json_path: pathlib.Path, fmt: str = "parquet") -> pathlib.Path:
+    """Save in `fmt` ("json", "parquet" or "both"); `json_path` names the transcript.
+
+    "json" removes an existing parquet pair: readers prefer parquet, so a
+    leftover pair would shadow the JSON just written.
+    """
+    if fmt not in TRANSCRIPT_FORMATS:
+        raise ValueError(f"fmt must be one of {TRANSCRIPT_FORMATS}, got {fmt!r}")
+    json_path = pathlib.Path(json_path)
+    out = json_path
+    if fmt in ("parquet", "both"):
+        out = write_transcript(data, json_path)
+    if fmt in ("json", "both"):
+        json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        out = json_path
+    if fmt == "json":
+        segments_path(json_path).unlink(missing_ok=True)     # segments first: it marks the pair as present
+        words_path(json_path).unlink(missing_ok=True)
+    return out
+
+
+def read_meta(path: pathlib.Path) -> Dict[str, Any]:
+    """Document-level keys, from the parquet footer only."""
+    md = pq.read_schema(segments_path(path)).metadata or {}
+    return json.loads(md.get(META_KEY, b"{}"))
+
+
+def read_segments(path: pathlib.Path, columns: Optional[Sequence[str]] = None) -> pa.Table:
+    """Segments table, reading only `columns` (default: all)."""
+    return pq.read_table(segments_path(path), columns=list(columns) if columns else None)
+
+
+def read_words(path: pathlib.Path, columns: Optional[Sequence[str]] = None) -> pa.Table:
+    return pq.read_table(words_path(path), columns=list(columns) if columns else None)
+
+
+def load_transcript(path: pathlib.Path, words: bool = True) -> Dict[str, Any]:
+    """JSON-shaped transcript from `X.json` or `X.segments.parquet`.
+
+    Parquet is used when present; `words=False` skips the words file.
+    """
+    path = pathlib.Path(path)
+    if segments_path(path).exists():
+        return from_tables(read_segments(path), read_words(path) if words else None, read_meta(path))
+    base = base_of(path)
+    return json.loads(base.with_name(base.name + ".json").read_text(encoding="utf-8"))
+
+
+def copy_words(src: pathlib.Path, dst: pathlib.Path) -> None:
+    """Copy the words file unchanged (stages that only touch segments)."""
+    tmp = words_path(dst).with_name(f".{words_path(dst).name}.tmp")
+    shutil.copyfile(words_path(src), tmp)
+    os.replace(tmp, words_path(dst))
+
+
+def write_segments(segs: pa.Table, path: pathlib.Path) -> pathlib.Path:
+    _atomic_write(segs.cast(SEGMENT_SCHEMA).replace_schema_metadata(segs.schema.metadata),
+                  segments_path(path))
+    return segments_path(path)
+
+
+# ---- converter ---------------------------------------------------------- #
+def convert(paths: Iterable[pathlib.Path], remove_json: bool = False) -> int:
+    """Convert existing `.json` transcripts to parquet; returns files converted."""
+    n = 0
+    for p in paths:
+        if segments_path(p).exists() and segments_path(p).stat().st_mtime >= p.stat().st_mtime:
+            continue
+        write_transcript(json.loads(p.read_text(encoding="utf-8")), p)
+        if remove_json:
+            p.unlink()
+        n += 1
+        log.info("Converted %s -> %s", p.name, segments_path(p).name)
+    return n
+
+
+def main():
+    configure_logging("aipe-ingest")
+    p = argparse.ArgumentParser(description="Columnar transcript tools")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="convert *.json transcripts to segments/words parquet")
+    c.add_argument("paths", nargs="+", type=pathlib.Path, help="files or directories")
+    c.add_argument("--remove-json", action="store_true", help="delete the JSON after converting")
+    args = p.parse_args()
+
+    files: List[pathlib.Path] = []
+    for path in args.paths:
+        files.extend(sorted(path.rglob("*.json")) if path.is_dir() else [path])
+    n = convert(files, remove_json=args.remove_json)
+    print(f"Converted {n} of {len(files)} transcripts")
+
+
+if __name__ == "__main__":
+    main()